@@ -0,0 +1,214 @@
+"""
+Headless benchmark of the game tick.
+
+Builds seeded worlds for a set of synthetic scenarios, runs a fixed number of World.step() ticks on each
+(the simulation half of CannonGame.update, no window needed) and reports mean / p95 / p99 tick time
+and the peak number of bytes allocated during a tick. Results can be saved as JSON and compared against an older run:
+
+    python benchmark.py --output before.json
+    python benchmark.py --compare before.json
+"""
+
+import argparse
+import gc
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from world import World, ObstacleState, WEAPONS, ENEMY_WEAPON
+
+#------------------------------------------------------------------------- scenarios -------------------------------------------------------------------------#
+
+# bullets and explosions are topped up to their count and the ground carved by the last tick is put back
+# before every tick, outside of the timed part
+SCENARIOS = {
+    "idle": dict(chunk_number=60),
+    "wide_map": dict(chunk_number=150),
+    "bullets_100": dict(chunk_number=60, bullets=100, weapons=(0, 1)),
+    "bullets_500": dict(chunk_number=60, bullets=500, weapons=(0, 1, "enemy")),
+    "lasers_50": dict(chunk_number=60, bullets=50, weapons=(2,)),
+    "explosions_100": dict(chunk_number=60, explosions=100),
+    "obstacles_40": dict(chunk_number=60, bullets=100, obstacles=40, weapons=(0, 1)),
+    "enemies_20": dict(chunk_number=60, enemies=20),
+    "mixed": dict(chunk_number=100, bullets=200, explosions=20, obstacles=20, enemies=10, weapons=(0, 1, 2, "enemy")),
+}
+
+
+def build_world(seed, chunk_number=60, obstacles=None, enemies=None, **_):
+    world = World(1600, 900, level=1, chunk_number=chunk_number, seed=seed)
+    rng = world.rng
+
+    if enemies is not None:
+        world.spawn_enemies(enemies)
+
+    if obstacles is not None:
+        # replace the generated obstacles with a fixed number of wells, repulsors and wormholes
+        world.obstacles.clear()
+        cs = world.cell_size
+        for k in range(obstacles):
+            center = (rng.uniform(0, world.width), rng.uniform(world.height * 0.3, world.height * 0.9))
+            kind = k % 3
+            if kind == 2:
+                wormhole_exit = (rng.uniform(0, world.width), rng.uniform(world.height * 0.3, world.height * 0.9))
+                world.obstacles.append(ObstacleState(cell_size=cs, center=center, wormhole=True, wormhole_exit=wormhole_exit, radius=3))
+            else:
+                radius = rng.randint(2, 4)
+                world.obstacles.append(ObstacleState(cell_size=cs, center=center, gravity=True, radius=radius,
+                                                     effectRadius=radius*3, repulsive=kind == 1))
+        world.index_obstacles()
+
+    return world
+
+
+def top_up(world, rng, ground, bullets=0, explosions=0, weapons=(0,), **_):
+    # keep the scenario's load steady: refill bullets and explosions that ended during the last tick
+    # and fill the craters they left, so the next ones hit the same ground
+    terrain = world.terrain
+    columns = np.nonzero((terrain.grid != ground).any(axis=1))[0]
+    if len(columns):
+        start, stop = int(columns[0]), int(columns[-1]) + 1
+        terrain.grid[start:stop] = ground[start:stop]
+        terrain.changed(start, stop)
+
+    cs = world.cell_size
+    while world.bullets.count < bullets:
+        choice = weapons[rng.randrange(len(weapons))]
+        weapon = ENEMY_WEAPON if choice == "enemy" else WEAPONS[choice]
+        radius = weapon["radius"] * cs
+        world.bullets.add(
+            x=rng.uniform(0, world.width),
+            y=rng.uniform(world.height * 0.4, world.height),
+            radius=radius,
+            angle=rng.uniform(0, math.pi),
+            speed=weapon["speed"] * cs * rng.uniform(0.3, 1),
+            mass=weapon["mass"] * cs,
+            effect_diameter=weapon["effect_diameter"],
+            drill=weapon["drill"],
+            repeat_explosions=weapon["repeat_explosions"],
+            laser=weapon["laser"],
+        )
+
+    while len(world.explosions) < explosions:
+        world.explode(rng.uniform(0, world.width), rng.uniform(0, world.height * 0.5), rng.randint(1, 4))
+
+    # nobody dies and the level never ends, so every tick does the same kind of work
+    world.tank.health = world.tank.max_health
+    for enemy in world.enemies:
+        enemy.health = enemy.max_health
+    world.events.clear()
+
+#------------------------------------------------------------------------- runs -------------------------------------------------------------------------#
+
+def run_scenario(name, params, ticks, seed):
+    world = build_world(seed, **params)
+    rng = random.Random(seed)
+    ground = world.terrain.grid.copy()
+
+    # warm up caches and lazy imports before anything is measured
+    for _ in range(min(ticks, 20)):
+        top_up(world, rng, ground, **params)
+        world.step()
+
+    gc.collect()
+    times = np.empty(ticks)
+    for i in range(ticks):
+        top_up(world, rng, ground, **params)
+        start = time.perf_counter_ns()
+        world.step()
+        times[i] = time.perf_counter_ns() - start
+
+    # a second, traced pass: tracemalloc slows everything down so its ticks are not timed
+    peaks = np.empty(ticks)
+    retained = np.empty(ticks)
+    tracemalloc.start()
+    for i in range(ticks):
+        top_up(world, rng, ground, **params)
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        world.step()
+        current, peak = tracemalloc.get_traced_memory()
+        peaks[i] = peak - before
+        retained[i] = current - before
+    tracemalloc.stop()
+
+    times /= 1e6
+    return {
+        "params": params,
+        "ticks": ticks,
+        "mean_ms": float(times.mean()),
+        "p95_ms": float(np.percentile(times, 95)),
+        "p99_ms": float(np.percentile(times, 99)),
+        "max_ms": float(times.max()),
+        "peak_alloc_bytes_per_tick": float(peaks.mean()),
+        "retained_bytes_per_tick": float(retained.mean()),
+    }
+
+
+def revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, max_regression):
+    # print the p95 ratio of every scenario both runs have, returns False if one got slower than allowed
+    ok = True
+    for name, result in results["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if old is None:
+            continue
+        ratio = result["p95_ms"] / max(old["p95_ms"], 1e-9)
+        regressed = ratio > max_regression
+        ok = ok and not regressed
+        print(f"{name:16} p95 {old['p95_ms']:8.3f} -> {result['p95_ms']:8.3f} ms  x{ratio:5.2f}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only these (repeatable)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of an earlier run to compare p95 tick times with")
+    parser.add_argument("--max-regression", type=float, default=1.25, help="p95 ratio above which --compare fails")
+    args = parser.parse_args(argv)
+
+    results = {
+        "revision": revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seed": args.seed,
+        "scenarios": {},
+    }
+
+    for name in args.scenario or SCENARIOS:
+        result = run_scenario(name, SCENARIOS[name], args.ticks, args.seed)
+        results["scenarios"][name] = result
+        print(f"{name:16} mean {result['mean_ms']:7.3f}  p95 {result['p95_ms']:7.3f}  p99 {result['p99_ms']:7.3f} ms"
+              f"  peak alloc {result['peak_alloc_bytes_per_tick'] / 1024:8.1f} KiB/tick")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=4)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if not compare(results, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
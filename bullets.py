@@ -0,0 +1,146 @@
+import math
+import numpy as np
+
+#------------------------------------------------------------------------- bullet pool -------------------------------------------------------------------------#
+
+class BulletPool:
+    """
+    Every live projectile as parallel arrays, slots [0, count) packed in firing order.
+    ids stay with a bullet for its whole flight, x, y is the bottom left of its bounding box.
+    """
+
+    FLOAT_FIELDS = ("x", "y", "prev_x", "prev_y", "radius", "mass", "speed", "angle", "flighttime", "drill", "effect_diameter")
+    BOOL_FIELDS = ("repeat_explosions", "laser")
+    TRAIL_POINTS = 6  # length of a laser's beam, in positions at the end of its last ticks
+
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.next_id = 0
+        self.capacity = 0
+        self.grown = 0
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        # reallocate every array with room for capacity bullets, keeping the live ones
+        for name in self.FLOAT_FIELDS:
+            self._resize(name, np.zeros(capacity, dtype=np.float64))
+        for name in self.BOOL_FIELDS:
+            self._resize(name, np.zeros(capacity, dtype=bool))
+        self._resize("ids", np.zeros(capacity, dtype=np.int64))
+        self._resize("owner", np.zeros(capacity, dtype=np.int64))  # World.shooter code of the unit that fired, -1 for nobody
+        # the last TRAIL_POINTS centres of every laser, oldest first, so the beam survives several ticks per frame
+        self._resize("trail", np.zeros((capacity, self.TRAIL_POINTS, 2), dtype=np.float64))
+        self._resize("trail_length", np.zeros(capacity, dtype=np.int64))
+        self.capacity = capacity
+
+    def _resize(self, name, array):
+        if self.count:
+            array[:self.count] = getattr(self, name)[:self.count]
+        setattr(self, name, array)
+
+    def stats(self):
+        # the arrays only grow, so once a fight reached its peak no more memory is taken
+        return {"capacity": self.capacity, "in_use": self.count, "grown": self.grown, "fired": self.next_id}
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def add(self, x, y, radius, angle, speed, mass, effect_diameter, drill, repeat_explosions=False, laser=False, owner=-1):
+        if self.count == self.capacity:
+            self.grow(self.capacity * 2)
+            self.grown += 1
+
+        i = self.count
+        self.x[i] = self.prev_x[i] = x
+        self.y[i] = self.prev_y[i] = y
+        self.radius[i] = radius
+        self.angle[i] = angle
+        self.speed[i] = speed
+        self.mass[i] = mass
+        self.flighttime[i] = 0
+        self.effect_diameter[i] = effect_diameter
+        self.drill[i] = drill
+        self.repeat_explosions[i] = bool(repeat_explosions)
+        self.laser[i] = bool(laser)
+        self.trail[i, 0] = (x + radius, y + radius)
+        self.trail_length[i] = 1
+        self.ids[i] = self.next_id
+        self.owner[i] = owner
+
+        self.next_id += 1
+        self.count += 1
+        return i
+
+    def remove(self, mask):
+        # drop every live bullet flagged in the boolean mask, the survivors keep their order
+        keep = ~mask[:self.count]
+        survivors = int(np.count_nonzero(keep))
+        for name in self.FLOAT_FIELDS + self.BOOL_FIELDS + ("ids", "owner", "trail", "trail_length"):
+            array = getattr(self, name)
+            array[:survivors] = array[:self.count][keep]
+        self.count = survivors
+
+#------------------------------------------------------------------------- batch physics -------------------------------------------------------------------------#
+
+    def integrate(self):
+        # one trajectory step for every live bullet
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        self.prev_x[:n] = x
+        self.prev_y[:n] = y
+        x += self.speed[:n] * np.cos(self.angle[:n])
+        y += self.speed[:n] * np.sin(self.angle[:n]) - self.mass[:n] * (self.flighttime[:n] + 1)
+        self.flighttime[:n] += 1
+
+    def extend_trails(self):
+        # add where every laser ended this tick to its trail, full trails drop their oldest point
+        n = self.count
+        lasers = np.nonzero(self.laser[:n])[0]
+        if not len(lasers):
+            return
+        lengths = self.trail_length[lasers]
+        full = lasers[lengths == self.TRAIL_POINTS]
+        self.trail[full, :-1] = self.trail[full, 1:]
+        slots = np.minimum(lengths, self.TRAIL_POINTS - 1)
+        self.trail[lasers, slots, 0] = self.x[lasers] + self.radius[lasers]
+        self.trail[lasers, slots, 1] = self.y[lasers] + self.radius[lasers]
+        self.trail_length[lasers] = slots + 1
+
+    def trail_points(self, i):
+        # the beam of laser i as a flat list of coordinates, for a Line
+        return self.trail[i, :self.trail_length[i]].ravel().tolist()
+
+    def touching_rect(self, rect):
+        # broad phase against a unit rectangle, same test as World.check_collision_circle
+        n = self.count
+        distance = np.hypot(self.x[:n] - (rect.x + rect.width / 2), self.y[:n] - (rect.y + rect.height / 2))
+        return distance <= (self.radius[:n] * 2 + rect.width) / 2
+
+    def touching_rects(self, xs, ys, widths, heights):
+        # touching_rect against arrays of rectangles, one row per bullet and one column per rectangle
+        n = self.count
+        distance = np.hypot(self.x[:n, None] - (xs + widths / 2), self.y[:n, None] - (ys + heights / 2))
+        return distance <= (self.radius[:n, None] * 2 + widths) / 2
+
+    def outside(self, width, height):
+        # bullets that left the window, lasers are also dropped above it
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        return (y < 0) | (x < 0) | (x > width) | ((y > height) & self.laser[:n])
+
+    def render_positions(self, alpha):
+        # positions between the last two ticks, for drawing
+        n = self.count
+        return (self.prev_x[:n] + (self.x[:n] - self.prev_x[:n]) * alpha,
+                self.prev_y[:n] + (self.y[:n] - self.prev_y[:n]) * alpha)
+
+    def reflect(self, i, normal_angle):
+        # mirror the direction of bullet i on a surface whose outward normal points at normal_angle,
+        # then bring it back to the range [-pi, pi)
+        angle = (2 * normal_angle - self.angle[i] + math.pi) % (2 * math.pi)
+        if angle >= math.pi:
+            angle -= 2 * math.pi
+        self.angle[i] = angle
@@ -0,0 +1,10 @@
+#------------------------------------------------------------------------- game clock -------------------------------------------------------------------------#
+
+class GameClock:
+    """Monotonic game time in seconds, moved on one tick per world step and never by the wall clock."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def advance(self, seconds):
+        self.now += seconds
@@ -0,0 +1,272 @@
+"""
+Gym-style environments over the headless World, for training and evaluating bots without a window.
+
+CannonEnv plays one level per episode with the gymnasium calling convention, without depending on it:
+
+    env = CannonEnv()
+    observation, info = env.reset(seed=1)
+    observation, reward, terminated, truncated, info = env.step({"move": 1, "aim": 0.6, "charge": True})
+
+VectorEnv steps K of them in one call and stacks what they return, in this process or spread over
+worker processes (workers > 0). Episodes that end are reset on the spot, as gymnasium's vector envs do.
+"""
+
+import math
+import multiprocessing
+
+import numpy as np
+
+from world import World
+
+#------------------------------------------------------------------------- single world -------------------------------------------------------------------------#
+
+class CannonEnv:
+    """
+    One World played through the same inputs as the player: movement keys, the mouse, the trigger and Tab.
+
+    An action is a dict, missing keys mean "do nothing":
+        move    -1 left, 0 stay, 1 right
+        aim     cannon angle in radians
+        charge  truthy holds the trigger down, the shot gets stronger the longer it is held
+        fire    truthy lets the trigger go and shoots; without a charge held from earlier steps
+                the shot is fired as if the trigger had been held for fire_charge seconds
+        switch  truthy switches to the next weapon
+
+    An observation is a dict of float32 arrays, positions are fractions of the window size:
+        terrain  ground height at terrain_samples evenly spaced x positions
+        tank     x, y, health, ammo, reloading, reload progress, charge, cannon angle, weapon
+        enemies  max_enemies rows of x, y, health, alive
+        bullets  max_bullets rows of x, y, vx, vy, present (the oldest live ones)
+
+    The reward is the fraction of enemy health taken off this step minus the fraction of the tank's health lost,
+    plus 1 for clearing the level and minus 1 for losing the tank. An episode is one level and ends with either,
+    or is truncated after time_limit seconds of game time.
+    """
+
+    terrain_samples = 128
+    max_enemies = World.max_enemies
+    max_bullets = 32
+
+    def __init__(self, width=1600, height=900, level=1, frame_skip=4, time_limit=120, tick_rate=120, fire_charge=2.0):
+        self.width = width
+        self.height = height
+        self.level = level
+        self.frame_skip = frame_skip  # world ticks per step, the action is held for all of them
+        self.time_limit = time_limit
+        self.tick_rate = tick_rate
+        self.fire_charge = fire_charge  # 2 seconds is a full power shot, see TankState.calculate_shoot_speed_multiplier
+        self.world = None
+        self.next_seed = None
+        self.aim = None  # the last aim asked for, held until another one comes
+
+    def reset(self, seed=None, level=None):
+        # a fresh level; without a seed the episodes go on from the last one so a seeded run stays seeded
+        if seed is None:
+            seed = self.next_seed
+        if level is not None:
+            self.level = level
+        self.world = World(self.width, self.height, level=self.level, tick_rate=self.tick_rate, seed=seed)
+        self.next_seed = self.world.rng.getrandbits(32)
+        self.aim = None
+        self.health = self.health_state()
+        return self.observe(), {"seed": self.world.seed, "level": self.level}
+
+    def step(self, action):
+        world = self.world
+        tank = world.tank
+
+        world.keys_pressed.discard("a")
+        world.keys_pressed.discard("d")
+        move = action.get("move", 0)
+        if move:
+            world.keys_pressed.add("d" if move > 0 else "a")
+
+        if "aim" in action:
+            self.aim = action["aim"]
+        self.point()
+
+        if action.get("switch"):
+            world.keys_up.append("tab")
+        if action.get("fire"):
+            if not tank.is_shooting:
+                world.press_trigger()
+                tank.shoot_start_time = world.now - self.fire_charge
+            world.release_trigger()
+        elif action.get("charge") and not tank.is_shooting:
+            world.press_trigger()
+
+        lost = won = False
+        for _ in range(self.frame_skip):
+            world.step()
+            self.point()
+            lost = "tank_destroyed" in world.events
+            won = "enemy_destroyed" in world.events
+            world.events.clear()
+            if lost or won:
+                break
+
+        health = self.health_state()
+        reward = (self.health[1] - health[1]).sum() - (self.health[0] - health[0])
+        self.health = health
+        reward += won - lost
+
+        truncated = not (lost or won) and world.now >= self.time_limit
+        info = {"level": world.level, "time": world.now, "shots": tank.total_shots, "won": won}
+        return self.observe(), float(reward), lost or won, truncated, info
+
+    def point(self):
+        # the world only turns the cannon towards the mouse, and the tank moves in between, so set the angle itself
+        # and put the mouse back on its line from where the tank is now
+        if self.aim is None:
+            return
+        tank = self.world.tank
+        tank.cannon_angle = self.aim
+        self.world.mouse = (tank.center_x + 100 * math.cos(self.aim), tank.center_y + 100 * math.sin(self.aim))
+
+    def health_state(self):
+        # the tank's and every enemy's health as a fraction of its maximum, dead enemies count 0
+        world = self.world
+        tank = world.tank
+        enemies = np.array([max(enemy.health, 0) / enemy.max_health for enemy in world.roster])
+        return max(tank.health, 0) / tank.max_health, enemies
+
+#------------------------------------------------------------------------- observations -------------------------------------------------------------------------#
+
+    def observe(self):
+        world = self.world
+        tank = world.tank
+        terrain = world.terrain
+        width, height = world.width, world.height
+
+        xs = np.linspace(0, width, self.terrain_samples)
+        columns = np.clip(((xs - terrain.x_offset) // terrain.cell_size).astype(np.int64), 0, terrain.columns - 1)
+        ground = terrain.tops[columns] * terrain.cell_size / height
+
+        weapon = world.weapons[world.current_weapon]
+        charge = tank.calculate_shoot_speed_multiplier(world.now) if tank.is_shooting else 0
+        tank_row = [tank.center_x / width, tank.center_y / height, tank.health / tank.max_health,
+                    tank.ammo / max(weapon["ammo_number"], 1), tank.reloading, min(tank.reload_progress(world.now), 1),
+                    charge, tank.cannon_angle, world.current_weapon]
+
+        enemies = np.zeros((self.max_enemies, 4), dtype=np.float32)
+        alive = set(world.enemies)
+        for k, enemy in enumerate(world.roster[:self.max_enemies]):
+            enemies[k] = (enemy.center_x / width, enemy.center_y / height, max(enemy.health, 0) / enemy.max_health,
+                          enemy in alive)
+
+        bullets = np.zeros((self.max_bullets, 5), dtype=np.float32)
+        pool = world.bullets
+        n = min(pool.count, self.max_bullets)
+        if n:
+            speed, angle = pool.speed[:n], pool.angle[:n]
+            bullets[:n, 0] = (pool.x[:n] + pool.radius[:n]) / width
+            bullets[:n, 1] = (pool.y[:n] + pool.radius[:n]) / height
+            bullets[:n, 2] = speed * np.cos(angle) / width
+            bullets[:n, 3] = (speed * np.sin(angle) - pool.mass[:n] * (pool.flighttime[:n] + 1)) / height
+            bullets[:n, 4] = 1
+
+        return {
+            "terrain": ground.astype(np.float32),
+            "tank": np.array(tank_row, dtype=np.float32),
+            "enemies": enemies,
+            "bullets": bullets,
+        }
+
+#------------------------------------------------------------------------- vectorized -------------------------------------------------------------------------#
+
+def stack(observations):
+    return {name: np.stack([observation[name] for observation in observations]) for name in observations[0]}
+
+
+def step_envs(envs, actions):
+    # step every env, resetting the ones whose episode ended; their last observation goes into the info
+    results = []
+    for env, action in zip(envs, actions):
+        observation, reward, terminated, truncated, info = env.step(action)
+        if terminated or truncated:
+            info["final_observation"] = observation
+            observation, _ = env.reset()
+        results.append((observation, reward, terminated, truncated, info))
+    return results
+
+
+def worker(connection, kwargs, count):
+    # runs count envs in a worker process and answers the commands VectorEnv sends
+    envs = [CannonEnv(**kwargs) for _ in range(count)]
+    while True:
+        command, argument = connection.recv()
+        if command == "reset":
+            connection.send([env.reset(seed=seed, level=argument["level"]) for env, seed in zip(envs, argument["seeds"])])
+        elif command == "step":
+            connection.send(step_envs(envs, argument))
+        elif command == "close":
+            connection.close()
+            return
+
+
+class VectorEnv:
+    """K CannonEnvs stepped together, with workers > 0 split over that many processes that step in parallel."""
+
+    def __init__(self, count, workers=0, **kwargs):
+        self.count = count
+        self.workers = min(workers, count)
+        if self.workers:
+            shares = [len(share) for share in np.array_split(np.arange(count), self.workers)]
+            self.connections = []
+            self.processes = []
+            for share in shares:
+                parent, child = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=worker, args=(child, kwargs, share), daemon=True)
+                process.start()
+                child.close()
+                self.connections.append(parent)
+                self.processes.append(process)
+            self.shares = shares
+        else:
+            self.envs = [CannonEnv(**kwargs) for _ in range(count)]
+
+    def reset(self, seed=None, level=None):
+        # env k gets seed + k, so a seeded vector env is seeded as a whole
+        seeds = [None if seed is None else seed + k for k in range(self.count)]
+        if self.workers:
+            results = self.gather("reset", [{"seeds": share, "level": level} for share in self.split(seeds)])
+        else:
+            results = [env.reset(seed=seed, level=level) for env, seed in zip(self.envs, seeds)]
+        observations, infos = zip(*results)
+        return stack(observations), list(infos)
+
+    def step(self, actions):
+        if self.workers:
+            results = self.gather("step", self.split(actions))
+        else:
+            results = step_envs(self.envs, actions)
+        observations, rewards, terminated, truncated, infos = zip(*results)
+        return (stack(observations), np.array(rewards, dtype=np.float32), np.array(terminated),
+                np.array(truncated), list(infos))
+
+    def split(self, items):
+        # the share of items of every worker, in order
+        shares = []
+        start = 0
+        for share in self.shares:
+            shares.append(items[start:start + share])
+            start += share
+        return shares
+
+    def gather(self, command, arguments):
+        for connection, argument in zip(self.connections, arguments):
+            connection.send((command, argument))
+        results = []
+        for connection in self.connections:
+            results.extend(connection.recv())
+        return results
+
+    def close(self):
+        if self.workers:
+            for connection in self.connections:
+                connection.send(("close", None))
+                connection.close()
+            for process in self.processes:
+                process.join()
+            self.workers = 0
+            self.envs = []
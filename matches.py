@@ -0,0 +1,192 @@
+"""
+Batch runner of headless matches, for tuning the enemies of every level.
+
+A match is a seeded World at one level: a scripted player fights the level's enemies until they are all destroyed,
+the tank is, or the time limit runs out. Matches are spread over a process pool and summed up per level:
+
+    python matches.py --levels 1-10 --matches 200
+    python matches.py --levels 5 --matches 1000 --accuracy 0.01 --output level5.json
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from world import World
+
+#------------------------------------------------------------------------- scripted player -------------------------------------------------------------------------#
+
+class ScriptedPlayer:
+    """Holds a full charge and fires at the nearest enemy's vacuum solution, off by a gaussian error of accuracy radians."""
+
+    charge = 2.0  # seconds of holding for a full power shot, see TankState.calculate_shoot_speed_multiplier
+
+    def __init__(self, rng, accuracy):
+        self.rng = rng
+        self.accuracy = accuracy
+        self.angle = 0
+
+    def act(self, world):
+        tank = world.tank
+        if tank.is_shooting:
+            self.point(world)
+            if world.now - tank.shoot_start_time >= self.charge:
+                world.release_trigger()
+            return
+
+        weapon = world.weapons[world.current_weapon]
+        if tank.reloading or not world.enemies or world.now - tank.last_timepoint < 1 / weapon["firerate"]:
+            return
+
+        target = min(world.enemies, key=lambda enemy: abs(enemy.center_x - tank.center_x))
+        self.angle = self.aim(world, weapon, target) + self.rng.gauss(0, self.accuracy)
+        self.point(world)
+        world.press_trigger()
+
+    def point(self, world):
+        # the mouse decides the cannon angle on the next step
+        tank = world.tank
+        world.mouse = (tank.center_x + 100 * math.cos(self.angle), tank.center_y + 100 * math.sin(self.angle))
+
+    def aim(self, world, weapon, target):
+        tank = world.tank
+        speed = weapon["speed"] * world.cell_size
+        g = weapon["mass"] * world.cell_size
+
+        # the muzzle moves with the angle, two rounds bring it close enough
+        x0, y0 = tank.center_x, tank.center_y
+        angle = 0
+        for _ in range(2):
+            dx, dy = target.center_x - x0, target.center_y - y0
+            discriminant = speed ** 4 - g * (g * dx ** 2 + 2 * dy * speed ** 2)
+            if g == 0:
+                angle = math.atan2(dy, dx)
+            elif discriminant >= 0:
+                angle = math.atan2(speed ** 2 - math.sqrt(discriminant), g * dx)
+            else:
+                angle = math.pi / 4 if dx >= 0 else 3 * math.pi / 4  # out of range, as far as it goes
+            shot = tank.projectile(weapon, world.cell_size, angle, 1)
+            x0, y0 = shot["x"] + shot["radius"], shot["y"] + shot["radius"]
+        return angle
+
+#------------------------------------------------------------------------- matches -------------------------------------------------------------------------#
+
+def play_match(job):
+    # one match, run in a worker process; returns a plain dict so it pickles cheaply
+    level, seed, accuracy, time_limit = job
+    world = World(1600, 900, level=level, seed=seed)
+    player = ScriptedPlayer(random.Random(f"player-{seed}"), accuracy)
+
+    result = "timeout"
+    ticks = round(time_limit * world.tick_rate)
+    while world.ticks < ticks:
+        player.act(world)
+        world.step()
+        if "tank_destroyed" in world.events:
+            result = "lost"
+            break
+        if "enemy_destroyed" in world.events:
+            result = "won"
+            break
+        world.events.clear()
+
+    return {
+        "level": level,
+        "seed": seed,
+        "result": result,
+        "time": world.now,
+        "shots": world.tank.total_shots,
+        "hits": world.tank.shots_landed,
+        "enemy_shots": sum(enemy.total_shots for enemy in world.roster),
+        "enemy_hits": sum(enemy.shots_landed for enemy in world.roster),
+        "enemies": len(world.roster),
+        "destroyed": len(world.roster) - len(world.enemies),
+    }
+
+
+def summarize(matches):
+    """Per level: outcome rates, time to kill of the won matches, shots, and both sides' hit rates (shots that hit the other side)."""
+    levels = {}
+    for match in matches:
+        levels.setdefault(match["level"], []).append(match)
+
+    table = {}
+    for level in sorted(levels):
+        rows = levels[level]
+        won = [row["time"] for row in rows if row["result"] == "won"]
+        shots = sum(row["shots"] for row in rows)
+        enemy_shots = sum(row["enemy_shots"] for row in rows)
+        table[level] = {
+            "matches": len(rows),
+            "won": sum(row["result"] == "won" for row in rows) / len(rows),
+            "lost": sum(row["result"] == "lost" for row in rows) / len(rows),
+            "timeout": sum(row["result"] == "timeout" for row in rows) / len(rows),
+            "ttk_mean": float(np.mean(won)) if won else None,
+            "ttk_p50": float(np.median(won)) if won else None,
+            "shots": shots / len(rows),
+            "hit_rate": sum(row["hits"] for row in rows) / shots if shots else None,
+            "enemy_hit_rate": sum(row["enemy_hits"] for row in rows) / enemy_shots if enemy_shots else None,
+            "enemies": sum(row["enemies"] for row in rows) / len(rows),
+            "destroyed": sum(row["destroyed"] for row in rows) / len(rows),
+        }
+    return table
+
+
+def parse_levels(text):
+    # "3", "1-10" or "1,4,7-9"
+    levels = []
+    for part in text.split(","):
+        first, _, last = part.partition("-")
+        levels.extend(range(int(first), int(last or first) + 1))
+    return levels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--levels", type=parse_levels, default=parse_levels("1-5"), help='e.g. "1-10" or "1,4,7-9"')
+    parser.add_argument("--matches", type=int, default=100, help="matches per level")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the first match, every level plays the same seeds")
+    parser.add_argument("--accuracy", type=float, default=0.02, help="standard deviation of the player's aim in radians")
+    parser.add_argument("--time-limit", type=float, default=120, help="game seconds before a match counts as a timeout")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes to play on")
+    parser.add_argument("--output", help="write the table and every match to this JSON file")
+    args = parser.parse_args(argv)
+
+    # the same seed gives the same ground at every level, the obstacles and enemies are what changes
+    jobs = [(level, args.seed + k, args.accuracy, args.time_limit) for level in args.levels for k in range(args.matches)]
+
+    start = time.perf_counter()
+    matches = []
+    with multiprocessing.Pool(args.workers) as pool:
+        for match in pool.imap_unordered(play_match, jobs, chunksize=max(1, len(jobs) // (args.workers * 8))):
+            matches.append(match)
+            if len(matches) % max(1, len(jobs) // 10) == 0:
+                print(f"{len(matches)}/{len(jobs)} matches, {time.perf_counter() - start:.0f} s", file=sys.stderr)
+    matches.sort(key=lambda match: (match["level"], match["seed"]))
+
+    table = summarize(matches)
+    print(f"{'level':>5} {'matches':>7} {'won':>6} {'lost':>6} {'t/o':>6} {'ttk':>7} {'ttk50':>7} {'shots':>6} "
+          f"{'hit':>6} {'e.hit':>6} {'killed':>9}")
+    for level, row in table.items():
+        def cell(value, spec):
+            return format(value, spec) if value is not None else f"{'-':>{spec.split('.')[0]}}"
+        print(f"{level:>5} {row['matches']:>7} {row['won']:6.1%} {row['lost']:6.1%} {row['timeout']:6.1%} "
+              f"{cell(row['ttk_mean'], '7.1f')} {cell(row['ttk_p50'], '7.1f')} {row['shots']:6.1f} "
+              f"{cell(row['hit_rate'], '6.1%')} {cell(row['enemy_hit_rate'], '6.1%')} "
+              f"{row['destroyed']:4.1f}/{row['enemies']:.1f}")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"args": vars(args), "levels": table, "matches": matches}, file, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
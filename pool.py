@@ -0,0 +1,28 @@
+#------------------------------------------------------------------------- object pool -------------------------------------------------------------------------#
+
+class Pool:
+    """Free list of reusable objects: acquire() reuses a released one or calls factory(), the caller re-arms it."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.free = []
+        self.created = 0
+        self.reused = 0
+        self.in_use = 0
+
+    def acquire(self):
+        if self.free:
+            item = self.free.pop()
+            self.reused += 1
+        else:
+            item = self.factory()
+            self.created += 1
+        self.in_use += 1
+        return item
+
+    def release(self, item):
+        self.in_use -= 1
+        self.free.append(item)
+
+    def stats(self):
+        return {"created": self.created, "reused": self.reused, "in_use": self.in_use, "free": len(self.free)}
@@ -0,0 +1,79 @@
+import time
+from collections import deque
+
+#------------------------------------------------------------------------- phase profiler -------------------------------------------------------------------------#
+
+class Profiler:
+    """
+    Named timing scopes aggregated over the last window samples, a nested scope is recorded as "outer/inner".
+    While disabled scope() hands back one shared do-nothing context.
+    """
+
+    def __init__(self, window=240):
+        self.enabled = False
+        self.window = window
+        self.samples = {}  # phase name -> deque of the last durations in seconds
+        self.open = []  # names of the scopes entered and not left yet, outermost first
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        return Scope(self, name)
+
+    def record(self, name, seconds):
+        self.phase(name).append(seconds)
+
+    def phase(self, name):
+        # the samples of a phase, made the first time it is entered or recorded
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+        return samples
+
+    def reset(self):
+        self.samples.clear()
+        self.open.clear()
+
+    def summary(self):
+        # {phase: (mean ms, max ms)} over the rolling window in the order the phases were first entered,
+        # every sub-scope right after the scope that contains it
+        first = {name: k for k, name in enumerate(self.samples)}
+        def order(name):
+            parts = name.split("/")
+            return [first.get("/".join(parts[:k + 1]), -1) for k in range(len(parts))]
+        return {name: (sum(samples) / len(samples) * 1000, max(samples) * 1000)
+                for name, samples in sorted(self.samples.items(), key=lambda item: order(item[0])) if samples}
+
+
+class Scope:
+    __slots__ = ("profiler", "name", "path", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.open.append(self.name)
+        self.path = "/".join(self.profiler.open)
+        self.profiler.phase(self.path)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        self.profiler.open.pop()
+        self.profiler.record(self.path, seconds)
+        return False
+
+
+class NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SCOPE = NullScope()
@@ -0,0 +1,192 @@
+"""
+Input recording and headless replay.
+
+A World is deterministic: its randomness comes from its seed and its clock from its ticks. A recording is
+therefore just the world's constructor arguments and the inputs it received, each tagged with the tick it
+arrived before: key and mouse changes, trigger presses and releases and loaded saves. It ends
+with the outcome the game reached, which a replay has to reproduce exactly.
+
+Set CANNON_RECORD to a directory to record every game played, then run a session again headlessly:
+
+    CANNON_RECORD=sessions python main.py
+    python replay.py sessions/session-20240101-120000-1234.jsonl.gz
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import time
+
+from clock import GameClock
+from world import World
+
+VERSION = 3  # 2: every level is built from a seed of its own, 3: enemies fire while their aim is being solved
+
+#------------------------------------------------------------------------- files -------------------------------------------------------------------------#
+
+def open_log(path, mode):
+    # one JSON value per line, gzipped when the name asks for it
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t")
+    return open(path, mode)
+
+
+def outcome(world):
+    # the state a replay has to end in
+    tank = world.tank
+    return {
+        "ticks": world.ticks,
+        "level": world.level,
+        "tank": [float(tank.x), float(tank.y), float(tank.health), float(tank.ammo), tank.total_shots],
+        "enemies": [[float(enemy.x), float(enemy.y), float(enemy.health)] for enemy in world.roster],
+        "fired": int(world.bullets.next_id),
+        "terrain": hashlib.sha1(world.terrain.grid.tobytes()).hexdigest(),
+    }
+
+#------------------------------------------------------------------------- recording -------------------------------------------------------------------------#
+
+class Recorder:
+    """Writes the inputs a world is fed to a session file, attach it right after the world is built."""
+
+    def __init__(self, path, world):
+        self.path = path
+        self.file = open_log(path, "w")
+        self.keys = set()
+        self.mouse = None
+        self.write({"version": VERSION, "seed": world.seed, "width": world.width, "height": world.height,
+                    "level": world.level, "chunk_size": world.chunk_size, "tick_rate": world.tick_rate, "now": world.now})
+        world.recorder = self
+
+    def write(self, value):
+        self.file.write(json.dumps(value, separators=(",", ":")) + "\n")
+
+    def inputs(self, world):
+        changes = {}
+        down = world.keys_pressed - self.keys
+        lifted = self.keys - world.keys_pressed
+        if down:
+            changes["down"] = sorted(down)
+        if lifted:
+            changes["lift"] = sorted(lifted)
+        if world.keys_up:
+            changes["up"] = list(world.keys_up)
+        mouse = [float(world.mouse[0]), float(world.mouse[1])]
+        if mouse != self.mouse:
+            changes["mouse"] = mouse
+
+        if changes:
+            self.write([world.ticks, "input", changes])
+            self.keys = set(world.keys_pressed)
+            self.mouse = mouse
+
+    def call(self, world, name, argument=None):
+        self.write([world.ticks, name] if argument is None else [world.ticks, name, argument])
+
+    def finish(self, world):
+        # write the outcome and let go of the world
+        self.write({"end": world.ticks, "outcome": outcome(world)})
+        self.file.close()
+        world.recorder = None
+
+
+def start_recording(world):
+    # a Recorder for world in the CANNON_RECORD directory, None when it is not set
+    directory = os.environ.get("CANNON_RECORD")
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    name = f"session-{time.strftime('%Y%m%d-%H%M%S')}-{world.seed}.jsonl.gz"
+    return Recorder(os.path.join(directory, name), world)
+
+#------------------------------------------------------------------------- replay -------------------------------------------------------------------------#
+
+def run_until(world, tick):
+    """Step the world up to tick, reacting to its events like CannonGame.update. False once the tank is destroyed."""
+    while world.ticks < tick:
+        world.step()
+        for event in world.events:
+            if event == "tank_destroyed":
+                world.events.clear()
+                return False
+            elif event == "enemy_destroyed":
+                world.new_level()
+        world.events.clear()
+    return True
+
+
+def replay(path):
+    """Play a session file again headlessly, returns (world, recorded outcome or None if it was cut off)."""
+    with open_log(path, "r") as file:
+        header = json.loads(file.readline())
+        if header.get("version") != VERSION:
+            raise ValueError(f"{path}: unsupported session version {header.get('version')}")
+
+        world = World(header["width"], header["height"], level=header["level"], chunk_size=header["chunk_size"],
+                      tick_rate=header["tick_rate"], seed=header["seed"], clock=GameClock(header.get("now", 0.0)))
+
+        playing = True
+        for line in file:
+            entry = json.loads(line)
+            if isinstance(entry, dict):
+                if playing:
+                    run_until(world, entry["end"])
+                return world, entry["outcome"]
+            if not playing:
+                continue
+
+            tick, name, *argument = entry
+            playing = run_until(world, tick)
+            if not playing:
+                continue
+
+            if name == "input":
+                changes = argument[0]
+                world.keys_pressed.update(changes.get("down", ()))
+                world.keys_pressed.difference_update(changes.get("lift", ()))
+                world.keys_up = list(changes.get("up", ()))
+                if "mouse" in changes:
+                    world.mouse = tuple(changes["mouse"])
+            elif name == "press":
+                world.press_trigger()
+            elif name == "release":
+                world.release_trigger()
+            elif name == "load":
+                world.load_game(argument[0])
+            else:
+                raise ValueError(f"{path}: unknown entry {name!r} at tick {tick}")
+
+    return world, None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded sessions headlessly and check their outcome.")
+    parser.add_argument("paths", nargs="+", help="session files written with CANNON_RECORD")
+    parser.add_argument("--repeat", type=int, default=1, help="play every session this many times")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for path in args.paths:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            world, expected = replay(path)
+            seconds = time.perf_counter() - start
+
+            # the outcome went through JSON when it was recorded, compare it the same way
+            result = json.loads(json.dumps(outcome(world)))
+            if expected is None:
+                verdict = "no recorded outcome"
+            elif result == expected:
+                verdict = "identical"
+            else:
+                verdict = "DIVERGED"
+                failed = True
+            print(f"{path}: {world.ticks} ticks ({world.now:.1f} s of play) in {seconds:.2f} s, "
+                  f"{world.ticks / max(seconds, 1e-9):.0f} ticks/s, {verdict}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Opt-in frame-time telemetry for playtests.
+
+CannonGame.update hands one row per frame to a TelemetrySink, which queues it for a writer thread so the frame
+never waits on the disk. Garbage collector pauses are logged as their own rows. The log is JSON lines or CSV
+(picked from the file extension) and rotates by size like logging's RotatingFileHandler: log, log.1, log.2, ...
+
+Turn it on by pointing CANNON_TELEMETRY at a file before starting the game, then summarize the run per level:
+
+    CANNON_TELEMETRY=playtest.jsonl python main.py
+    python telemetry.py playtest.jsonl
+"""
+
+import argparse
+import csv
+import gc
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+# columns of a CSV log, a JSON line only carries the ones a row has
+FIELDS = ("kind", "time", "dt", "sim_time", "level", "fps", "bullets", "explosions", "enemies", "widgets",
+          "gc_generation", "gc_collected", "gc_pause")
+
+#------------------------------------------------------------------------- sink -------------------------------------------------------------------------#
+
+class TelemetrySink:
+    """Buffered, rotating log of frame samples, record() only queues the row for the writer thread."""
+
+    flush_interval = 1.0  # seconds the writer waits for more rows before flushing the file anyway
+
+    def __init__(self, path, max_bytes=8 * 1024 * 1024, backups=5, watch_gc=True):
+        self.path = path
+        self.csv = path.lower().endswith(".csv")
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.start = time.perf_counter()
+        self.level = None  # level of the last frame, given to the gc rows
+        self.rows = queue.SimpleQueue()
+        self.file = None
+        self.writer = None
+        self.gc_start = None
+
+        self.thread = threading.Thread(target=self.run, name="telemetry", daemon=True)
+        self.thread.start()
+
+        self.watch_gc = watch_gc
+        if watch_gc:
+            gc.callbacks.append(self.on_gc)
+
+    def record(self, **row):
+        row.setdefault("kind", "frame")
+        row.setdefault("time", time.perf_counter() - self.start)
+        self.level = row.get("level", self.level)
+        self.rows.put(row)
+
+    def frame(self, dt, world, fps=None, widgets=None):
+        # one sample of CannonGame.update
+        self.record(dt=dt, sim_time=world.now, level=world.level, fps=fps, bullets=world.bullets.count,
+                    explosions=len(world.explosions), enemies=len(world.enemies), widgets=widgets)
+
+    def on_gc(self, phase, info):
+        # gc.callbacks hook: time every collection from its start to its stop
+        if phase == "start":
+            self.gc_start = time.perf_counter()
+        elif self.gc_start is not None:
+            pause = time.perf_counter() - self.gc_start
+            self.gc_start = None
+            self.record(kind="gc", level=self.level, gc_generation=info["generation"], gc_collected=info["collected"],
+                        gc_pause=pause)
+
+    def close(self):
+        if self.watch_gc:
+            gc.callbacks.remove(self.on_gc)
+            self.watch_gc = False
+        self.rows.put(None)
+        self.thread.join()
+
+#------------------------------------------------------------------------- writer thread -------------------------------------------------------------------------#
+
+    def run(self):
+        closing = False
+        while not closing:
+            try:
+                batch = [self.rows.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self.rows.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                closing = True
+                batch = batch[:batch.index(None)]
+
+            if batch:
+                self.write(batch)
+            if self.file is not None:
+                self.file.flush()
+
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def write(self, batch):
+        if self.file is None:
+            self.open()
+        if self.csv:
+            self.writer.writerows(batch)
+        else:
+            self.file.writelines(json.dumps({key: value for key, value in row.items() if value is not None}) + "\n"
+                                 for row in batch)
+        if self.file.tell() >= self.max_bytes:
+            self.rotate()
+
+    def open(self):
+        new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self.file = open(self.path, "a", newline="" if self.csv else None)
+        if self.csv:
+            self.writer = csv.DictWriter(self.file, fieldnames=FIELDS, extrasaction="ignore")
+            if new:
+                self.writer.writeheader()
+
+    def rotate(self):
+        # log -> log.1 -> log.2 ..., the oldest backup is dropped
+        self.file.close()
+        self.file = None
+        for k in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{k}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{k + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+def from_environment():
+    # the sink CANNON_TELEMETRY asks for, None when it is not set
+    path = os.environ.get("CANNON_TELEMETRY")
+    return TelemetrySink(path) if path else None
+
+#------------------------------------------------------------------------- summary -------------------------------------------------------------------------#
+
+def log_files(path):
+    # the rotated backups of a log followed by the log itself, oldest first
+    backups = []
+    k = 1
+    while os.path.exists(f"{path}.{k}"):
+        backups.append(f"{path}.{k}")
+        k += 1
+    return backups[::-1] + ([path] if os.path.exists(path) else [])
+
+
+def read_rows(path):
+    for name in log_files(path):
+        with open(name, newline="") as file:
+            if path.lower().endswith(".csv"):
+                for row in csv.DictReader(file):
+                    yield {key: value for key, value in row.items() if value != ""}
+            else:
+                for line in file:
+                    if line.strip():
+                        yield json.loads(line)
+
+
+def summarize(path):
+    """Per level: frame count, dt mean and percentiles in ms, gc collections and their total pause in ms."""
+    frames = {}
+    pauses = {}
+    for row in read_rows(path):
+        level = int(float(row["level"])) if "level" in row else None
+        if row.get("kind", "frame") == "gc":
+            pauses.setdefault(level, []).append(float(row["gc_pause"]))
+        else:
+            frames.setdefault(level, []).append(float(row["dt"]))
+
+    table = {}
+    for level in sorted(set(frames) | set(pauses), key=lambda level: (level is None, level)):
+        dts = np.array(frames.get(level, []), dtype=np.float64) * 1000
+        gc_pauses = np.array(pauses.get(level, []), dtype=np.float64) * 1000
+        entry = {"frames": len(dts), "gc": len(gc_pauses), "gc_ms": float(gc_pauses.sum()),
+                 "gc_max_ms": float(gc_pauses.max()) if len(gc_pauses) else 0.0}
+        if len(dts):
+            p50, p90, p95, p99 = np.percentile(dts, (50, 90, 95, 99)).tolist()
+            entry.update(mean_ms=float(dts.mean()), p50_ms=p50, p90_ms=p90, p95_ms=p95, p99_ms=p99,
+                         max_ms=float(dts.max()))
+        table[level] = entry
+    return table
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Percentile table per level of a telemetry log.")
+    parser.add_argument("path", help="the log CANNON_TELEMETRY pointed at, its rotated backups are read too")
+    parser.add_argument("--json", action="store_true", help="print the table as JSON")
+    args = parser.parse_args(argv)
+
+    table = summarize(args.path)
+    if args.json:
+        print(json.dumps({str(level): entry for level, entry in table.items()}, indent=4))
+        return 0
+
+    columns = ("mean_ms", "p50_ms", "p90_ms", "p95_ms", "p99_ms", "max_ms")
+    print(f"{'level':>5} {'frames':>7} " + " ".join(f"{name[:-3]:>7}" for name in columns) + f" {'gc':>5} {'gc ms':>8}")
+    for level, entry in table.items():
+        times = " ".join(f"{entry[name]:7.2f}" if name in entry else f"{'-':>7}" for name in columns)
+        print(f"{'-' if level is None else level:>5} {entry['frames']:>7} {times} {entry['gc']:>5} {entry['gc_ms']:8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
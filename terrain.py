@@ -0,0 +1,376 @@
+import math
+import numpy as np
+
+#------------------------------------------------------------------------- cell flags -------------------------------------------------------------------------#
+# the low bits of every grid entry hold the cell flags
+SOLID = 1
+BULLETPROOF = 2
+REFLECTIVE = 4
+ELASTIC = 8
+
+# the high bits hold the surface layer, only used to pick the ground colour
+LAYER_SHIFT = 4
+LAYER_BASE = 0
+LAYER_TOP = 1
+LAYER_SECOND = 2
+LAYER_THIRD = 3
+LAYER_ROCK = 4
+
+# sides of a cell, Terrain.faces holds the ones not covered by a solid neighbour
+FACE_LEFT = 1
+FACE_RIGHT = 2
+FACE_BOTTOM = 4
+FACE_TOP = 8
+
+# direction of the outward normal of every side, in radians
+FACE_NORMAL_ANGLES = {FACE_LEFT: math.pi, FACE_RIGHT: 0, FACE_BOTTOM: -math.pi / 2, FACE_TOP: math.pi / 2}
+
+
+class Cell:
+    """Read-only rectangle view of one terrain cell, shaped like the widgets the collision helpers expect."""
+    __slots__ = ("cx", "cy", "x", "y", "width", "height", "value")
+
+    def __init__(self, cx, cy, x, y, size, value):
+        self.cx = cx
+        self.cy = cy
+        self.x = x
+        self.y = y
+        self.width = size
+        self.height = size
+        self.value = value
+
+    @property
+    def right(self):
+        return self.x + self.width
+
+    @property
+    def top(self):
+        return self.y + self.height
+
+    @property
+    def pos(self):
+        return (self.x, self.y)
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+    @property
+    def bulletproof(self):
+        return bool(self.value & BULLETPROOF)
+
+    @property
+    def reflective(self):
+        return bool(self.value & REFLECTIVE)
+
+    @property
+    def elastic(self):
+        return bool(self.value & ELASTIC)
+
+#------------------------------------------------------------------------- terrain grid -------------------------------------------------------------------------#
+
+class Terrain:
+    """
+    A (columns, rows) uint8 grid of cell flags, cell (0, 0) is bottom left.
+    faces and tops are kept up to date by every edit, which also bumps version.
+    """
+
+    def __init__(self, columns, rows, cell_size, x_offset=0):
+        self.columns = columns
+        self.rows = rows
+        self.cell_size = cell_size
+        self.x_offset = x_offset
+        self.grid = np.zeros((columns, rows), dtype=np.uint8)
+        self.faces = np.zeros((columns, rows), dtype=np.uint8)
+        self.tops = np.zeros(columns, dtype=np.int64)
+        self.version = 0
+        self.column_versions = np.zeros(columns, dtype=np.int64)  # version of the last edit that reached each column
+
+    @classmethod
+    def from_heights(cls, heights, rows, cell_size, x_offset=0):
+        terrain = cls(len(heights), rows, cell_size, x_offset)
+        terrain.fill_heights(heights)
+        return terrain
+
+    def fill_heights(self, heights):
+        # every column is solid from the bottom row up to its height, the last rows get the surface layers
+        heights = np.minimum(np.asarray(heights, dtype=np.int32), self.rows)[:, None]
+        ys = np.arange(self.rows, dtype=np.int32)[None, :]
+
+        layers = np.full(self.grid.shape, LAYER_BASE, dtype=np.uint8)
+        flags = np.full(self.grid.shape, SOLID, dtype=np.uint8)
+
+        rock = np.broadcast_to(ys < 1, self.grid.shape)
+        layers[rock] = LAYER_ROCK
+        flags[rock] |= BULLETPROOF
+        # the surface layers win over the bedrock on very low columns, like the original tile generator
+        for layer, depth in ((LAYER_THIRD, 3), (LAYER_SECOND, 2), (LAYER_TOP, 1)):
+            surface = np.broadcast_to(ys == heights - depth, self.grid.shape)
+            layers[surface] = layer
+            flags[surface] = SOLID
+
+        solid = ys < heights
+        self.grid[:] = np.where(solid, flags | (layers << LAYER_SHIFT), 0)
+        self.changed()
+
+    def fill_column(self, cx, cy, count, flags):
+        # stack count cells of the given flags on top of each other starting at row cy
+        if 0 <= cx < self.columns:
+            cy_end = min(cy + count, self.rows)
+            if cy < cy_end:
+                self.grid[cx, max(cy, 0):cy_end] = flags | SOLID
+                self.changed(cx, cx + 1)
+
+    def changed(self, start=0, stop=None):
+        # bring the caches up to date after the columns [start, stop) were edited
+        self.update_tops(start, stop)
+        self.update_faces(start, stop)
+        self.version += 1
+        # the faces of the neighbouring columns changed with them
+        stop = self.columns if stop is None else stop
+        self.column_versions[max(start - 1, 0):min(stop + 1, self.columns)] = self.version
+
+    def changed_since(self, version, start=0, stop=None):
+        # whether any of the columns [start, stop) was edited after the terrain was at version
+        versions = self.column_versions[max(start, 0):stop]
+        return bool(len(versions)) and int(versions.max()) > version
+
+    def update_tops(self, start=0, stop=None):
+        solid = (self.grid[start:stop] & SOLID) != 0
+        highest = self.rows - np.argmax(solid[:, ::-1], axis=1)
+        self.tops[start:stop] = np.where(solid.any(axis=1), highest, 0)
+
+    def update_faces(self, start=0, stop=None):
+        # recompute the exposed sides after the columns [start, stop) changed, a side is exposed when no solid cell covers it
+        # (the columns on either side are redone too, and read one more column each way, off the grid counts as empty)
+        start = max(start - 1, 0)
+        stop = self.columns if stop is None else min(stop + 1, self.columns)
+        if start >= stop:
+            return
+
+        lo, hi = max(start - 1, 0), min(stop + 1, self.columns)
+        padded = np.pad((self.grid[lo:hi] & SOLID) != 0, 1)
+        solid = padded[1:-1, 1:-1]
+
+        faces = np.zeros(solid.shape, dtype=np.uint8)
+        for face, neighbour in ((FACE_LEFT, padded[:-2, 1:-1]), (FACE_RIGHT, padded[2:, 1:-1]),
+                                (FACE_BOTTOM, padded[1:-1, :-2]), (FACE_TOP, padded[1:-1, 2:])):
+            faces[solid & ~neighbour] |= face
+
+        self.faces[start:stop] = faces[start - lo:stop - lo]
+
+#------------------------------------------------------------------------- queries -------------------------------------------------------------------------#
+
+    def __len__(self):
+        return int(np.count_nonzero(self.grid & SOLID))
+
+    def to_cell(self, x, y):
+        return int(math.floor((x - self.x_offset) / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def cell_origin(self, cx, cy):
+        return cx * self.cell_size + self.x_offset, cy * self.cell_size
+
+    def in_bounds(self, cx, cy):
+        return 0 <= cx < self.columns and 0 <= cy < self.rows
+
+    def solid_at(self, cx, cy):
+        # nothing above a column's top is solid, so most lookups next to the surface never touch the grid
+        return self.in_bounds(cx, cy) and cy < self.tops[cx] and bool(self.grid[cx, cy] & SOLID)
+
+    def solid_at_point(self, x, y):
+        cx, cy = self.to_cell(x, y)
+        return self.solid_at(cx, cy)
+
+    def columns_between(self, x0, x1):
+        # columns overlapping the open pixel span (x0, x1), decided in pixels so borders are exact
+        first = int(math.floor((x0 - self.x_offset) / self.cell_size))
+        if self.x_offset + (first + 1) * self.cell_size <= x0:
+            first += 1
+        last = int(math.ceil((x1 - self.x_offset) / self.cell_size))
+        if self.x_offset + (last - 1) * self.cell_size >= x1:
+            last -= 1
+        return range(first, last)
+
+    def rows_between(self, y0, y1):
+        # rows overlapping the open pixel span (y0, y1)
+        first = int(math.floor(y0 / self.cell_size))
+        if (first + 1) * self.cell_size <= y0:
+            first += 1
+        last = int(math.ceil(y1 / self.cell_size))
+        if (last - 1) * self.cell_size >= y1:
+            last -= 1
+        return range(first, last)
+
+    def solid_in_rows(self, x0s, x1s, cys):
+        # for arrays of open pixel spans (x0, x1) with one row each, whether a solid cell of that row lies under the span
+        first = np.floor((x0s - self.x_offset) / self.cell_size).astype(np.int64)
+        first += self.x_offset + (first + 1) * self.cell_size <= x0s
+        last = np.ceil((x1s - self.x_offset) / self.cell_size).astype(np.int64)
+        last -= self.x_offset + (last - 1) * self.cell_size >= x1s
+
+        # one column per cell a span can cover, the ones past its end or off the grid are masked out
+        cxs = first[:, None] + np.arange(int((last - first).max(initial=0)))
+        inside = (cxs < last[:, None]) & (cxs >= 0) & (cxs < self.columns) & ((cys >= 0) & (cys < self.rows))[:, None]
+        np.minimum(np.maximum(cxs, 0, out=cxs), self.columns - 1, out=cxs)
+        rows = np.minimum(np.maximum(cys, 0), self.rows - 1)[:, None]
+        return (inside & (rows < self.tops[cxs]) & ((self.grid[cxs, rows] & SOLID) != 0)).any(axis=1)
+
+    def column_top(self, cx):
+        # row above the highest solid cell of a column, 0 for empty columns and off the grid
+        return int(self.tops[cx]) if 0 <= cx < self.columns else 0
+
+    def can_step_up(self, cx, cy, h):
+        # whether the h cells above (cx, cy) are free, so a unit h cells tall fits on top of that cell
+        if not 0 <= cx < self.columns or self.tops[cx] <= cy + 1:
+            return True
+        return not (self.grid[cx, max(cy + 1, 0):cy + 1 + h] & SOLID).any()
+
+    def above_ground(self, x0, x1, y):
+        # whether the pixel span [x0, x1] at height y is a cell above the highest ground of the columns around it,
+        # a cheap broad phase for a single bullet
+        first = max(int((x0 - self.x_offset) // self.cell_size) - 1, 0)
+        last = min(int((x1 - self.x_offset) // self.cell_size) + 2, self.columns)
+        if first >= last:
+            return True
+        return y >= (int(self.tops[first:last].max()) + 1) * self.cell_size
+
+    def solid_near(self, xs, ys):
+        # for arrays of points, whether any solid cell lies in the 3x3 block of cells around each point
+        # (points off the map are checked against the nearest edge cells, a harmless false positive at worst)
+        around = np.array([-1, 0, 1])
+        cxs = np.floor((xs - self.x_offset) / self.cell_size).astype(np.int64)[:, None] + around
+        cys = np.floor(ys / self.cell_size).astype(np.int64)[:, None] + around
+        np.minimum(np.maximum(cxs, 0, out=cxs), self.columns - 1, out=cxs)
+        np.minimum(np.maximum(cys, 0, out=cys), self.rows - 1, out=cys)
+        return (self.grid[cxs[:, :, None], cys[:, None, :]] & SOLID).any(axis=(1, 2))
+
+    def solid_near_segments(self, x0s, y0s, x1s, y1s, max_cells=4):
+        """For arrays of segments, whether each one may cross a solid cell; ones longer than max_cells are always reported."""
+        lengths = np.maximum(np.abs(x1s - x0s), np.abs(y1s - y0s)) / self.cell_size
+        samples = int(math.ceil(min(lengths.max(initial=0), max_cells)))
+
+        # fractions of every segment at 0, 1, 2 ... cells along it, plus its end
+        s = np.minimum(np.arange(samples + 1)[:, None] / np.maximum(lengths, 1e-9), 1)
+        s[-1] = 1
+        near = self.solid_near((x0s + (x1s - x0s) * s).ravel(), (y0s + (y1s - y0s) * s).ravel())
+        return near.reshape(s.shape).any(axis=0) | (lengths > max_cells)
+
+    def exposed_face(self, cx, cy, dx, dy):
+        # the exposed side of a cell that a movement of (dx, dy) most likely came in through
+        horizontal = FACE_LEFT if dx > 0 else FACE_RIGHT
+        vertical = FACE_BOTTOM if dy > 0 else FACE_TOP
+        first, second = (horizontal, vertical) if abs(dx) >= abs(dy) else (vertical, horizontal)
+
+        exposed = self.faces[cx, cy]
+        for face in (first, second):
+            if exposed & face:
+                return face
+        return first
+
+    def cell(self, cx, cy):
+        x, y = self.cell_origin(cx, cy)
+        return Cell(cx, cy, x, y, self.cell_size, int(self.grid[cx, cy]))
+
+    def segment_cells(self, x0, y0, x1, y1):
+        """
+        Yield (cx, cy, face, t) for every cell the segment passes through, in order (Amanatides and Woo).
+        face is the FACE_* side it came in through, None for the start cell, and t how far along it was.
+        """
+        size = self.cell_size
+        cx, cy = self.to_cell(x0, y0)
+        end_cx, end_cy = self.to_cell(x1, y1)
+        dx, dy = x1 - x0, y1 - y0
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+
+        # fraction of the segment to the next vertical / horizontal grid line, and between two of them
+        if dx != 0:
+            next_x = ((cx + (step_x > 0)) * size + self.x_offset - x0) / dx
+            delta_x = size / abs(dx)
+        else:
+            next_x = delta_x = math.inf
+        if dy != 0:
+            next_y = ((cy + (step_y > 0)) * size - y0) / dy
+            delta_y = size / abs(dy)
+        else:
+            next_y = delta_y = math.inf
+
+        yield cx, cy, None, 0.0
+        for _ in range(abs(end_cx - cx) + abs(end_cy - cy)):
+            if next_x < next_y:
+                t = next_x
+                cx += step_x
+                next_x += delta_x
+                face = FACE_LEFT if step_x > 0 else FACE_RIGHT
+            else:
+                t = next_y
+                cy += step_y
+                next_y += delta_y
+                face = FACE_BOTTOM if step_y > 0 else FACE_TOP
+            if t > 1:
+                break  # rounding at a cell corner, the end cell was reached the other way round
+            yield cx, cy, face, t
+
+    def raycast(self, x0, y0, x1, y1):
+        # first solid cell crossed by the segment as (cx, cy, face, t), or None
+        for cx, cy, face, t in self.segment_cells(x0, y0, x1, y1):
+            if self.solid_at(cx, cy):
+                return cx, cy, face, t
+        return None
+
+    def quads(self, start=0, stop=None):
+        """Vertices (x, y, u, v) and indices of one quad per solid cell in the columns [start, stop), by cell value."""
+        block = self.grid[start:stop]
+        xs, ys = np.nonzero(block & SOLID)
+        values = block[xs, ys]
+        size = self.cell_size
+
+        groups = {}
+        for value in np.unique(values).tolist():
+            mask = values == value
+            count = int(np.count_nonzero(mask))
+            x = (xs[mask] + start) * size + self.x_offset
+            y = ys[mask] * size
+
+            vertices = np.empty((count, 4, 4), dtype=np.float64)
+            vertices[:, :, 0] = x[:, None] + np.array([0, size, size, 0])
+            vertices[:, :, 1] = y[:, None] + np.array([0, 0, size, size])
+            vertices[:, :, 2] = (0, 1, 1, 0)
+            vertices[:, :, 3] = (0, 0, 1, 1)
+            indices = np.arange(count)[:, None] * 4 + np.array([0, 1, 2, 2, 3, 0])
+
+            groups[value] = (vertices.ravel().tolist(), indices.ravel().tolist())
+        return groups
+
+#------------------------------------------------------------------------- edits -------------------------------------------------------------------------#
+
+    def clear(self, cx, cy):
+        if self.in_bounds(cx, cy):
+            self.grid[cx, cy] = 0
+            self.changed(cx, cx + 1)
+
+    def carve_circle(self, x, y, radius, protected=BULLETPROOF | ELASTIC):
+        """Clear the solid, unprotected cells whose centres lie within radius + cell_size / 2 of (x, y), returns the changed columns."""
+        size = self.cell_size
+        reach = radius + size / 2
+
+        cx0, cy0 = self.to_cell(x - reach, y - reach)
+        cx1, cy1 = self.to_cell(x + reach, y + reach)
+        cx0, cy0 = max(cx0, 0), max(cy0, 0)
+        cx1, cy1 = min(cx1, self.columns - 1), min(cy1, self.rows - 1)
+
+        if cx0 > cx1 or cy0 > cy1:
+            return []
+
+        centres_x = np.arange(cx0, cx1 + 1) * size + self.x_offset + size / 2
+        centres_y = np.arange(cy0, cy1 + 1) * size + size / 2
+        inside = (centres_x[:, None] - x) ** 2 + (centres_y[None, :] - y) ** 2 <= reach ** 2
+
+        block = self.grid[cx0:cx1 + 1, cy0:cy1 + 1]
+        hit = inside & ((block & SOLID) != 0) & ((block & protected) == 0)
+        block[hit] = 0
+
+        columns = (np.nonzero(hit.any(axis=1))[0] + cx0).tolist()
+        if columns:
+            self.changed(columns[0], columns[-1] + 1)
+        return columns
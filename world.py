@@ -0,0 +1,1478 @@
+import copy
+import math
+import operator
+import random
+import numpy as np
+
+from bullets import BulletPool
+from clock import GameClock
+from pool import Pool
+from profiler import Profiler
+from terrain import Terrain, REFLECTIVE, ELASTIC, FACE_NORMAL_ANGLES
+
+# The simulation side of the game. Nothing in here imports Kivy: CannonGame owns a World,
+# feeds it the input state, calls step() and draws whatever the world contains.
+
+#------------------------------------------------------------------------- Weapons -------------------------------------------------------------------------#
+
+WEAPONS = [{
+    "name": "Bullet",
+    "mass": 0.025,
+    "effect_diameter": 3,
+    "speed": 2,
+    "firerate": 2,
+    "reload_speed": 1,
+    "ammo_number": 5,
+    "radius": 0.5,
+    "drill": 0,
+    "repeat_explosions": False,
+    "laser": False,
+},
+{
+    "name": "Bombshell",
+    "mass": 0.05,
+    "effect_diameter": 10,
+    "speed": 1.3,
+    "firerate": 3,
+    "reload_speed": 1,
+    "ammo_number": 30,
+    "radius": 0.3,
+    "drill": 10,
+    "repeat_explosions": False,
+    "laser": False,
+},
+{
+    "name": "Laser",
+    "mass": 0.0,
+    "effect_diameter": 1,
+    "speed": 1,
+    "firerate": 3,
+    "reload_speed": 1,
+    "ammo_number": 30,
+    "radius": 0.5,
+    "drill": 500,
+    "repeat_explosions": False,
+    "laser": True,
+}]
+
+ENEMY_WEAPON = {
+    "name": "sniper",
+    "mass": 0.0001,
+    "effect_diameter": 5,
+    "speed": 2,
+    "firerate": 0.0001,
+    "reload_speed": 6,
+    "ammo_number": 300,
+    "radius": 0.6,
+    "drill": 0,
+    "repeat_explosions": False,
+    "laser": False,
+}
+
+#------------------------------------------------------------------------- obstacles -------------------------------------------------------------------------#
+
+class ObstacleState:
+    def __init__(self, cell_size, center, gravity=False, wormhole=False, wormhole_exit=(0, 0), color=(0, 0, 0), repulsive=False, radius=3, effectRadius=0, attraction=3):
+        self.cell_size = cell_size
+        self.center_x, self.center_y = center
+        self.gravity = gravity
+        self.wormhole = wormhole
+        self.wormhole_exit = list(wormhole_exit)
+        self.color = color
+        self.repulsive = repulsive
+        self.radius = radius
+        self.effectRadius = effectRadius
+        self.attraction = attraction
+
+    def mouths(self):
+        # the points the obstacle acts around, a wormhole also acts around its exit
+        if self.wormhole:
+            return [(self.center_x, self.center_y), tuple(self.wormhole_exit)]
+        return [(self.center_x, self.center_y)]
+
+    def influence(self):
+        # discs (x, y, radius) outside of which the obstacle does nothing to a bullet
+        reach = max(self.effectRadius if self.gravity else 0, self.radius if self.wormhole else 0) * self.cell_size
+        return [(x, y, reach) for x, y in self.mouths()]
+
+    def pull(self):
+        # signed strength of a gravity well, World.apply_obstacles pulls all bullets towards every well at once
+        return self.attraction * self.cell_size * (-1 if self.repulsive else 1)
+
+    def wormholeCheck(self, bullets, idx):
+        reach = self.radius * self.cell_size
+        centre_x = bullets.x[idx] + bullets.radius[idx]
+        centre_y = bullets.y[idx] + bullets.radius[idx]
+
+        # bullets at the entrance come out of the exit
+        entering = np.hypot(self.center_x - centre_x, self.center_y - centre_y) < reach
+
+        # and the other way around
+        exiting = ~entering & (np.hypot(self.wormhole_exit[0] - centre_x, self.wormhole_exit[1] - centre_y) < reach)
+
+        bullets.x[idx[entering]] = self.wormhole_exit[0] + reach
+        bullets.y[idx[entering]] = self.wormhole_exit[1] + reach
+        bullets.x[idx[exiting]] = self.center_x + reach
+        bullets.y[idx[exiting]] = self.center_y + reach
+
+        # a laser's beam starts again on the other side
+        bullets.trail_length[idx[entering | exiting]] = 0
+
+#------------------------------------------------------------------------- units -------------------------------------------------------------------------#
+
+class UnitState:
+    """Position, movement and ammunition shared by the tank and the enemy."""
+
+    owner = -1  # code its bullets and explosions carry back to it, see World.shooter
+
+    def __init__(self, health=1, ammo=10, max_ammo=10, reload_time=10, speed=0.2, mass=0.3, cannon_angle=0):
+        self.x = 0
+        self.y = 0
+        self.width = 0
+        self.height = 0
+        self.cannon_angle = cannon_angle
+        self.cannon_length = 0
+        self.speed = speed
+        self.mass = mass
+
+        self.health = health
+        self.max_health = health
+        self.ammo = ammo
+        self.max_ammo = max_ammo
+        self.reload_time = reload_time
+        self.reloading = False
+        self.last_timepoint = -math.inf  # game time of the last shot or reload start, nothing yet
+        self.shots_landed = 0  # shots of this unit that hit someone on the other side, each counted once
+        self.render_prev = None  # position at the start of the last tick, for interpolated drawing
+
+    @property
+    def right(self):
+        return self.x + self.width
+
+    @property
+    def top(self):
+        return self.y + self.height
+
+    @property
+    def center_x(self):
+        return self.x + self.width / 2
+
+    @property
+    def center_y(self):
+        return self.y + self.height / 2
+
+    @property
+    def pos(self):
+        return (self.x, self.y)
+
+    @pos.setter
+    def pos(self, pos):
+        self.x, self.y = pos
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+    @size.setter
+    def size(self, size):
+        self.width, self.height = size
+
+    def render_pos(self, alpha):
+        # position between the last two ticks, alpha = 0 is the previous tick and 1 the current one
+        if self.render_prev is None:
+            return (self.x, self.y)
+        prev_x, prev_y = self.render_prev
+        return (prev_x + (self.x - prev_x) * alpha, prev_y + (self.y - prev_y) * alpha)
+
+    def cannon_tip(self):
+        return (self.center_x + self.cannon_length * math.cos(self.cannon_angle),
+                self.center_y + self.cannon_length * math.sin(self.cannon_angle))
+
+    def move_right(self, cell_size):
+        self.x += self.speed*cell_size
+
+    def move_left(self, cell_size):
+        self.x -= self.speed*cell_size
+
+    def fall(self, cell_size):
+        self.y -= self.mass*cell_size
+
+    def hit(self, damage=1):
+        self.health -= damage
+
+    def reload_weapon(self, now):
+        if not self.reloading:
+            self.reloading = True
+            self.last_timepoint = now
+            self.ammo = 0  # Reset ammunition count when reloading
+
+    def check_reloading(self, now):
+        if self.reloading:
+            if now - self.last_timepoint >= self.reload_time:
+                self.reloading = False
+                self.ammo = self.max_ammo  # Refill ammunition count after reloading
+
+    def reload_progress(self, now):
+        # fraction of the magazine shown by the reload bar
+        if self.reloading:
+            return (now - self.last_timepoint) / self.reload_time
+        return self.ammo / self.max_ammo
+
+
+class TankState(UnitState):
+    owner = 0
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.is_shooting = False
+        self.shoot_start_time = 0
+        self.total_shots = 0
+
+    def set_cannon_angle(self, mouse_pos):
+        """Set the angle of the cannon based on the mouse position."""
+        dx = mouse_pos[0] - self.center_x
+        dy = mouse_pos[1] - self.center_y
+        self.cannon_angle = math.atan2(dy, dx)
+
+    def shoot(self, world):
+        weapon = world.weapons[world.current_weapon]
+        firerate = weapon.get("firerate")
+        now = world.now
+
+        if now - self.last_timepoint >= 1 / firerate and not self.reloading:
+            world.bullets.add(**self.projectile(weapon, world.cell_size, self.cannon_angle, self.calculate_shoot_speed_multiplier(now)),
+                              owner=self.owner)
+
+            self.ammo -= 1
+            self.total_shots += 1  # Increment the total shots counter
+
+            if self.ammo <= 0:
+                self.reload_weapon(now)
+
+            self.last_timepoint = now
+            self.shoot_start_time = 0
+
+    def projectile(self, weapon, cell_size, angle, speed_multiplier):
+        # the BulletPool.add arguments of a shot fired with this weapon, also used for the trajectory preview
+        radius = weapon.get("radius", None) * cell_size
+        return dict(
+            x=self.center_x + (self.cannon_length * 2) * math.cos(angle) - radius,
+            y=self.center_y + (self.cannon_length * 2) * math.sin(angle) - radius,
+            radius=radius,
+            angle=angle,
+            speed=weapon.get("speed", None) * cell_size * speed_multiplier,
+            mass=weapon.get("mass", None) * cell_size,
+            effect_diameter=weapon.get("effect_diameter", None),
+            drill=weapon.get("drill", None),
+            repeat_explosions=weapon.get("repeat_explosions", None),
+            laser=weapon.get("laser", None),
+        )
+
+    def calculate_shoot_speed_multiplier(self, now):
+        hold_duration = now - self.shoot_start_time
+        return min(1, hold_duration*0.5)  # Cap the speed multiplier at 2x
+
+    def switch_weapon(self, weapon, now):
+        self.ammo = 0
+        self.max_ammo = weapon["ammo_number"]
+        self.reload_time = weapon["reload_speed"]
+        self.reloading = False
+        self.last_timepoint = now
+        self.reload_weapon(now)
+
+
+class EnemyState(UnitState):
+    def __init__(self, **kwargs):
+        kwargs.setdefault("cannon_angle", math.pi)
+        super().__init__(**kwargs)
+        self.last_shot_time = -math.inf
+        self.total_shots = 0
+
+        #ai_settings
+        self.direct_hitter = False
+        self.imprecision = 0.1
+        self.weapon_range = 50
+        self.moving = True
+
+    def shoot(self, world):
+        weapon = world.enemy_weapon
+
+        firerate = weapon.get("firerate")
+        now = world.now
+
+        if now - self.last_shot_time >= 1 / firerate and not self.reloading:
+            world.bullets.add(**self.projectile(weapon, world.cell_size, self.cannon_angle), owner=self.owner)
+
+            self.last_shot_time = now
+            self.total_shots += 1
+
+            self.ammo -= 1
+
+            if self.ammo <= 0:
+                self.reload_weapon(now)
+
+            self.last_timepoint = now
+
+    def projectile(self, weapon, cell_size, angle):
+        # the BulletPool.add arguments of a shot fired at angle, also flown by the aiming solver
+        radius = weapon.get("radius", None)*cell_size
+        return dict(
+            x=self.center_x + (self.cannon_length +5) * math.cos(angle)-radius,
+            y=self.center_y + (self.cannon_length +5) * math.sin(angle)-radius,
+            radius=radius,
+            angle=angle,
+            speed=weapon.get("speed", None)*cell_size,
+            mass=weapon.get("mass", None)*cell_size,
+            effect_diameter=weapon.get("effect_diameter", None),
+            drill=weapon.get("drill", None),
+            repeat_explosions=weapon.get("repeat_explosions", None),
+            laser=weapon.get("laser", None),
+        )
+
+    def enemy_ai(self, world, target_x, target_y):
+        # World.enemies_ai already checked range and reload for every enemy, this one fires
+        angle = world.enemy_aim(self, target_x, target_y)
+        self.cannon_angle = angle + world.rng.uniform(-self.imprecision, self.imprecision)
+        self.shoot(world)
+
+    def stats(self):
+        return {
+            "speed": self.speed,
+            "mass": self.mass,
+            "moving": self.moving,
+            "health": self.health,
+            "max_health": self.max_health,
+            "weapon_range": self.weapon_range,
+            "direct_hitter": self.direct_hitter,
+            "imprecision": self.imprecision,
+            "ammo": self.ammo,
+            "max_ammo": self.max_ammo,
+            "reload_time": self.reload_time
+        }
+
+    def restore(self, stats):
+        for name, value in stats.items():
+            setattr(self, name, value)
+        if self.health <= 0:
+            self.health = self.max_health  # saves are written once the level is won, the enemies come back for the replay
+
+#------------------------------------------------------------------------- explosions -------------------------------------------------------------------------#
+
+class ExplosionState:
+    explosion_speed = 7
+
+    def __init__(self, effect_diameter=0, pos=(0, 0), owner=-1, shot=-1):
+        self.arm(effect_diameter, pos, owner, shot)
+
+    def arm(self, effect_diameter, pos, owner=-1, shot=-1):
+        # (re)start the explosion, pooled explosions are armed again instead of being built anew
+        # owner and shot are the owner and id of the bullet it came from
+        self.x, self.y = pos
+        self.owner = owner
+        self.shot = shot
+        self.effect_diameter = effect_diameter #this is used to determine the meximum size of the explosion
+        self.radius = 0 #this is the actual radius of the explosion
+        self.radius_steps = self.effect_diameter/self.explosion_speed
+
+    def increase_explosion_radius(self):
+        self.radius += self.radius_steps
+
+#------------------------------------------------------------------------- aiming -------------------------------------------------------------------------#
+
+class AimJob:
+    """A queued World.solve_aim of one enemy, best is the angle it fires at until the solve is done."""
+
+    def __init__(self, key, version, best):
+        self.key = key
+        self.version = version
+        self.best = best
+        self.first = None
+        self.last = None
+        self.solve = None
+        self.steps = 0  # flight steps run, restarts included
+
+    def cover(self, terrain, xs):
+        # widen the columns the flights crossed by the ones under xs
+        columns = (xs - terrain.x_offset) // terrain.cell_size
+        first, last = int(columns.min()), int(columns.max())
+        self.first = first if self.first is None else min(self.first, first)
+        self.last = last if self.last is None else max(self.last, last)
+
+#------------------------------------------------------------------------- world -------------------------------------------------------------------------#
+
+class World:
+    """
+    Headless game state in pixel coordinates, step() runs one fixed tick on keys_pressed, keys_up and mouse.
+    Randomness comes from rng (seeded with seed) and time from clock, so the same inputs always play the same game.
+    """
+
+    max_catch_up = 8  # ticks a single advance() may run before the backlog is dropped
+
+    # trajectory preview: how far it looks ahead, how finely the aim is quantized for its cache
+    # and how many steps of a new path are flown per frame
+    preview_steps = 360
+    preview_angle_step = math.radians(0.5)
+    preview_power_step = 0.05
+    preview_cache_size = 256
+    preview_steps_per_call = 24
+
+    # enemy aiming: candidate shots flown around each root of the vacuum solution and how long they are followed
+    aim_spread = 0.2
+    aim_candidates_per_root = 9
+    aim_refinements = 2
+    aim_steps = 4000
+    aim_min_speed = 0.5
+    aim_steps_per_tick = 12
+    aim_step_budget = 1200  # flight steps a solve may take in all, then the best shot so far is taken
+
+    max_enemies = 20
+
+    def __init__(self, width, height, level=1, chunk_size=2, chunk_number=None, heights=None, tick_rate=120, seed=None, clock=None):
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
+        self.recorder = None  # replay.Recorder logging the inputs, if the session is recorded
+
+        self.width = width
+        self.height = height
+        self.level = level
+        self.chunk_size = chunk_size
+        self.chunk_number = chunk_number if chunk_number is not None else self.rng.randint(50, 75)
+        self.grid_size_y = 50 # Define the size of the grid
+
+        self.weapons = copy.deepcopy(WEAPONS)
+        self.current_weapon = 0
+        self.enemy_weapon = dict(ENEMY_WEAPON)
+
+        self.keys_pressed = set()
+        self.keys_up = []
+        self.mouse = (0, 0)
+
+        self.tick_rate = tick_rate
+        self.tick = 1 / tick_rate
+        self.ticks = 0  # steps run so far
+        self.clock = clock if clock is not None else GameClock()
+        self.accumulator = 0
+        self.profiler = Profiler()  # off until someone turns it on, see CannonGame.toggle_profiler
+
+        self.terrain = None
+        self.tank = None
+        self.enemies = []  # the ones still standing
+        self.roster = []  # every enemy the level started with, for saving
+        self.bullets = BulletPool()
+        self.landed = set()  # ids of the shots that already hit someone this level
+        self.explosions = set()
+        self.explosion_pool = Pool(ExplosionState)
+        self.preview_bullets = BulletPool(capacity=1)
+        self.previews = {}
+        self.preview_job = None  # (cache key, path so far, simulate_shot generator) of the path being flown
+        self.aim_bullets = BulletPool(capacity=2 * self.aim_candidates_per_root)
+        self.aims = {}  # cache key -> (angle, first, last, version), see enemy_aim
+        self.aim_jobs = {}  # enemy -> AimJob
+        self.aimed = {}  # enemy -> the angle of its last solve
+        self.obstacles = []
+        self.index_obstacles()
+        self.events = []
+        self.dirty_chunks = set()
+
+        self.grid_size_x = self.chunk_number*self.chunk_size-1  # Define the size of the grid
+        self.heights = heights if heights is not None else self.generate_heights(amplitude=self.rng.randint(3, 5))
+        self.build_level()
+        self.level_seed = self.rng.getrandbits(32)  # what the next level is built from, see build_level_ahead
+
+    @property
+    def now(self):
+        # game time in seconds, it only moves with the ticks
+        return self.clock.now
+
+#-------------------------------------------------------------------------map generation-------------------------------------------------------------------------#
+    def generate_heights(self, amplitude, grid_size_x=None, rng=None):
+        # grid_size_x and rng default to this world's, a level built ahead passes its own
+        grid_size_x = grid_size_x if grid_size_x is not None else self.grid_size_x
+        rng = rng if rng is not None else self.rng
+
+        # Define the parameters for scaling
+        frequency = rng.randint(1, 3)
+        offset_y = amplitude +10
+        offset_x = rng.randint(0, int(grid_size_x/frequency))
+        # Calculate the heights using a sine function
+        heights = []
+        for x in range(grid_size_x):
+            # Scale the sine function to fit within [0, 10]
+            y = math.sin(((x+offset_x) * (2 * math.pi / grid_size_x))*frequency) * amplitude + offset_y
+
+            heights.append(round(y))  # Round the result to the nearest integer
+        return heights
+
+    def build_level(self, tank_pos=None, spawn=True):
+        # (re)build terrain, obstacles and units for the current heights and size; without spawn no enemies are made
+        self.grid_size_x = self.chunk_number * self.chunk_size - 1
+        self.cell_size = self.width / self.grid_size_x
+        self.bullets.clear()
+        self.landed.clear()
+        for explosion in self.explosions:
+            self.explosion_pool.release(explosion)
+        self.explosions.clear()
+        self.obstacles.clear()
+        self.dirty_chunks.clear()
+
+        self.terrain_gen()
+        self.create_tank(tank_pos)
+        if spawn:
+            self.spawn_enemies()
+
+    def upcoming_level(self):
+        # the arguments of build_level_ahead for the level after this one
+        return (self.level + 1, self.level_seed, self.width, self.height)
+
+    def build_level_ahead(self, level, seed, width, height):
+        """Build the level seed makes on a scratch World that only reads this one's fixed settings, so it can run on a thread."""
+        rng = random.Random(seed)
+        chunk_number = rng.randint(50, 75)
+        heights = self.generate_heights(rng.randint(3, 6), chunk_number * self.chunk_size - 1, rng)
+        return World(width, height, level=level, chunk_size=self.chunk_size, chunk_number=chunk_number, heights=heights,
+                     tick_rate=self.tick_rate, seed=rng.getrandbits(32))
+
+    def new_level(self, prepared=None):
+        """
+        Switch to the next map, taking over prepared (an (upcoming_level(), build_level_ahead(...)) pair) if it matches.
+        Returns whether prepared was used.
+        """
+        key = (self.level, self.level_seed, self.width, self.height)
+        prepared_level = prepared[1] if prepared is not None and prepared[0] == key else None
+        ahead = prepared_level if prepared_level is not None else self.build_level_ahead(*key)
+
+        self.chunk_number = ahead.chunk_number
+        self.grid_size_x = ahead.grid_size_x
+        self.cell_size = ahead.cell_size
+        self.heights = ahead.heights
+        self.bullets.clear()
+        self.landed.clear()
+        for explosion in self.explosions:
+            self.explosion_pool.release(explosion)
+        self.explosions.clear()
+        self.dirty_chunks.clear()
+
+        self.terrain = ahead.terrain
+        self.obstacles = ahead.obstacles
+        self.index_obstacles()
+        self.create_tank()
+        self.enemies = ahead.enemies
+        self.roster = ahead.roster
+        self.enemy_weapon = ahead.enemy_weapon
+        self.level_seed = self.rng.getrandbits(32)
+        return prepared_level is not None
+
+    def load_game(self, game_stats):
+        if self.recorder is not None:
+            self.recorder.call(self, "load", game_stats)
+        self.level = game_stats['level']
+
+        # Set terrain stats
+        self.chunk_number = game_stats['terrain']['chunk_number']
+        self.heights = game_stats['terrain']['heights']
+        self.chunk_size = game_stats['terrain']['chunk_size']
+
+        # Generate the terrain and initialize the game objects
+        self.build_level(spawn=False)
+
+        # then put back the saved enemies (older saves hold a single one)
+        saved = game_stats.get('enemies') or [game_stats['enemy']]
+        self.enemy_weapon = game_stats['enemy_weapon']
+        self.place_enemies(len(saved))
+        for enemy, stats in zip(self.roster, saved):
+            enemy.restore(stats)
+
+    def terrain_gen(self):
+        # Generate terrain
+
+        x_offset = (self.width - self.grid_size_x * self.cell_size) / 2
+
+        # the terrain grid is the only ground state, renderers just draw it
+        self.terrain = Terrain.from_heights(self.heights, self.grid_size_y, self.cell_size, x_offset)
+
+        x = 0
+
+        while x < len(self.heights):
+            if x % 4 == 0 and x != 0 and x > 15:
+                rand = self.rng.randint(0, max(100-self.level, 20))
+                if rand < 10:
+                    # Generate a mirror obstacle
+                    h = self.heights[x]
+                    mirror_height = self.rng.randint(10, 20)
+
+                    # Randomly choose if the mirror is reflective (blue) or elastic (red gum)
+                    is_reflective = self.rng.choice([True, False])
+
+                    mirror_flags = REFLECTIVE if is_reflective else ELASTIC
+                    self.terrain.fill_column(x, h, mirror_height, mirror_flags)
+
+                elif 11 <= rand <= 12:
+                    radius = self.rng.randint(2, 3)
+                    height_above_ground = self.rng.randint(4, 6)
+
+                    # Generate a gravity obstacle
+                    obstacle = ObstacleState(
+                        cell_size=self.cell_size,
+                        gravity=True,
+                        center=((x * self.cell_size), (self.heights[x] + height_above_ground) * self.cell_size),
+                        radius=radius,
+                        effectRadius=radius*3,
+                    )
+                    self.obstacles.append(obstacle)
+
+                elif 13 <= rand <= 14:
+                    # Generate a wormhole obstacle with random height above ground and random radius
+                    height_above_ground = self.rng.randint(5, 10)
+                    radius = self.rng.randint(2, 3)
+                    wormhole_exit_x = (x * self.cell_size) + self.rng.randint(15, 20) * self.cell_size
+                    wormhole_exit_y = ((self.heights[x] + height_above_ground) * self.cell_size) + self.rng.randint(-3, 3) * self.cell_size
+
+                    if wormhole_exit_x > self.grid_size_x * self.cell_size:
+                        wormhole_exit_x = (self.grid_size_x-20) * self.cell_size
+
+                    color = (self.rng.randint(0, 10)*0.1, self.rng.randint(0, 10)*0.1, self.rng.randint(0, 10)*0.1)
+
+                    obstacle = ObstacleState(
+                        cell_size=self.cell_size,
+                        wormhole=True,
+                        gravity=False,
+                        wormhole_exit=(wormhole_exit_x, wormhole_exit_y),
+                        radius=radius,
+                        color=color,
+                        center=((x * self.cell_size), (self.heights[x] + height_above_ground) * self.cell_size)
+                    )
+                    self.obstacles.append(obstacle)
+
+                elif 15 <= rand <= 16:
+                    radius = self.rng.randint(2, 3)
+                    height_above_ground = self.rng.randint(3, 6)
+
+                    # Generate a gravity obstacle
+                    obstacle = ObstacleState(
+                        cell_size=self.cell_size,
+                        gravity=True,
+                        center=((x * self.cell_size), (self.heights[x] + height_above_ground) * self.cell_size),
+                        radius=radius,
+                        effectRadius=radius*3,
+                        repulsive=True
+                    )
+                    self.obstacles.append(obstacle)
+
+            x += 1
+
+        self.index_obstacles()
+
+    def index_obstacles(self):
+        """Bucket the obstacles by the chunks their influence discs overlap and pack the gravity parameters into arrays."""
+        buckets = [[] for _ in range(self.chunk_number)]
+        for k, obstacle in enumerate(self.obstacles):
+            for x, y, reach in obstacle.influence():
+                for chunk in self.chunks_between(x - reach, x + reach):
+                    if k not in buckets[chunk]:
+                        buckets[chunk].append(k)
+
+        self.obstacle_table = np.full((self.chunk_number, max(map(len, buckets), default=0)), -1, dtype=np.int64)
+        for chunk, bucket in enumerate(buckets):
+            self.obstacle_table[chunk, :len(bucket)] = bucket
+
+        self.well_x = np.array([obstacle.center_x for obstacle in self.obstacles], dtype=np.float64)
+        self.well_y = np.array([obstacle.center_y for obstacle in self.obstacles], dtype=np.float64)
+        self.well_reach = np.array([obstacle.effectRadius * obstacle.cell_size if obstacle.gravity else 0
+                                    for obstacle in self.obstacles], dtype=np.float64)
+        self.well_pull = np.array([obstacle.pull() for obstacle in self.obstacles], dtype=np.float64)
+        self.wormholes = np.array([obstacle.wormhole for obstacle in self.obstacles], dtype=bool)
+
+        # the cached trajectories and aims flew past the old obstacles
+        self.previews.clear()
+        self.preview_job = None
+        self.aims.clear()
+        self.aim_jobs.clear()
+        self.aimed.clear()
+
+    def create_tank(self, new_pos = None):
+        weapon = self.weapons[self.current_weapon]
+
+        self.tank = TankState(health=10, ammo=weapon["ammo_number"], max_ammo=weapon["ammo_number"], reload_time=weapon["reload_speed"])
+
+        if new_pos == None:
+            self.tank.pos = (self.cell_size, (self.heights[0]+1)*(self.cell_size))
+        else:
+            self.tank.pos = (new_pos[0], new_pos[1])
+
+        self.tank.size = (self.cell_size*2, self.cell_size*2)
+        self.tank.cannon_length = self.tank.height
+
+    def spawn_enemies(self, count=None):
+        self.place_enemies(count if count is not None else self.enemy_count())
+
+        # Randomize enemy stats based on the current level
+        self.randomize_enemy_stats()
+
+    def place_enemies(self, count):
+        # the first enemy stands near the right edge, the others are spread out towards the middle of the map
+        self.enemies = []
+        self.roster = []
+
+        size = self.cell_size*2
+        first_x = self.width - self.cell_size*10 - size
+        last_x = max(self.width / 2, first_x - (count - 1) * size * 2)
+        for k in range(count):
+            x = first_x - (first_x - last_x) * k / max(count - 1, 1)
+            top = max((self.terrain.column_top(cx) for cx in self.terrain.columns_between(x, x + size)), default=0)
+            self.spawn_enemy((x, (top + 2) * self.cell_size))
+
+    def spawn_enemy(self, new_pos=None):
+        enemy = EnemyState(ammo=self.enemy_weapon["ammo_number"], max_ammo=self.enemy_weapon["ammo_number"], reload_time=self.enemy_weapon["reload_speed"])
+        enemy.size = (self.cell_size*2, self.cell_size*2)
+        enemy.cannon_length = enemy.height * 1.5
+
+        if new_pos == None:
+            enemy.pos = (self.width - self.cell_size*10 - enemy.size[0], (self.heights[-5] + 2) * self.cell_size)
+        else:
+            enemy.pos = (new_pos[0], new_pos[1])
+
+        self.enemies.append(enemy)
+        self.roster.append(enemy)
+        enemy.owner = len(self.roster)
+        return enemy
+
+    def enemy_count(self):
+        # one more enemy every few levels, up to max_enemies
+        level_multiplier = 1 + (self.level * 0.3)
+        return max(1, min(int(level_multiplier), self.max_enemies))
+
+    def randomize_enemy_stats(self):
+        # Increase enemy stats based on the current level
+        level_multiplier = 1 + (self.level * 0.3)
+
+        for enemy in self.enemies:
+            enemy.speed = self.rng.uniform(1, 4) * level_multiplier
+            enemy.mass = self.rng.uniform(1, 1.5) * level_multiplier
+            enemy.moving = self.rng.choice([False, False])
+            enemy.health = self.rng.randint(1, 2) * level_multiplier
+            enemy.max_health = enemy.health
+            enemy.weapon_range = self.rng.uniform(200, 300) * level_multiplier
+            enemy.direct_hitter = self.rng.choice([True, False])
+            enemy.imprecision = self.rng.uniform(0.01, 0.1) / level_multiplier
+
+        # Increase enemy weapon stats based on the current level
+        self.enemy_weapon["speed"] = self.rng.uniform(1, 2)
+        self.enemy_weapon["mass"] = self.rng.uniform(0.01, 0.05) / level_multiplier
+        self.enemy_weapon["effect_diameter"] = self.rng.randint(1, 3) * level_multiplier
+        self.enemy_weapon["firerate"] = self.rng.uniform(0.1, 0.5) * level_multiplier
+        self.enemy_weapon["reload_speed"] = self.rng.uniform(1, 3) * level_multiplier
+        self.enemy_weapon["ammo_number"] = self.rng.randint(1, 3) * level_multiplier
+        self.enemy_weapon["radius"] = self.rng.uniform(0.3, 0.8) * level_multiplier
+        self.enemy_weapon["drill"] = self.rng.randint(0, 2) * level_multiplier
+        self.enemy_weapon["repeat_explosions"] = self.rng.choice([True, False])
+        self.enemy_weapon["laser"] = False
+
+        # Apply the new stats to the enemies
+        for enemy in self.enemies:
+            enemy.ammo = self.enemy_weapon["ammo_number"]
+            enemy.max_ammo = self.enemy_weapon["ammo_number"]
+            enemy.reload_time = self.enemy_weapon["reload_speed"]
+
+    def level_stats(self):
+        return {
+            "level": self.level,
+            "enemies": [enemy.stats() for enemy in self.roster],
+            "enemy_weapon": dict(self.enemy_weapon),
+            "terrain": {
+                "chunk_number": self.chunk_number,
+                "heights": self.heights,
+                "chunk_size": self.chunk_size
+            }
+        }
+
+#------------------------------------------------------------------------- chunks -------------------------------------------------------------------------#
+    def chunk_index(self, x):
+        # chunk containing the world x coordinate, clamped to the map
+        i = int((x - self.terrain.x_offset) // (self.chunk_size * self.cell_size))
+        return min(max(i, 0), self.chunk_number - 1)
+
+    def chunks_between(self, x0, x1, pad_left=0, pad_right=0):
+        # indices of the chunks covering [x0, x1], widened by pad_left / pad_right neighbouring chunks
+        first = max(self.chunk_index(x0) - int(pad_left), 0)
+        last = min(self.chunk_index(x1) + int(pad_right), self.chunk_number - 1)
+        return range(first, last + 1)
+
+    def remove_ground(self, ground):
+        # clear a cell from the terrain grid and remember which chunk has to be redrawn
+        self.terrain.clear(ground.cx, ground.cy)
+        self.dirty_chunks.add(ground.cx // self.chunk_size)
+
+#------------------------------------------------------------------------- input -------------------------------------------------------------------------#
+    def press_trigger(self):
+        if self.recorder is not None:
+            self.recorder.call(self, "press")
+        self.tank.is_shooting = True
+        self.tank.shoot_start_time = self.now
+
+    def release_trigger(self):
+        if self.recorder is not None:
+            self.recorder.call(self, "release")
+        self.tank.is_shooting = False
+        self.tank.shoot(self)
+
+    def hit_tank(self):
+        self.tank.hit()
+        if self.tank.health < 1:
+            self.events.append("tank_destroyed")
+
+    def shooter(self, owner):
+        # the unit behind an owner code: 0 is the tank, k the k-th enemy of the roster, -1 nobody
+        if owner < 0:
+            return None
+        return self.tank if owner == 0 else self.roster[owner - 1]
+
+    def credit(self, owner, shot, target):
+        # count the hit for the shooter when it is on the other side of target, once per shot
+        shooter = self.shooter(owner)
+        if shooter is None or (shooter is self.tank) == (target is self.tank) or shot in self.landed:
+            return
+        self.landed.add(int(shot))
+        shooter.shots_landed += 1
+
+    def hit_enemy(self, enemy):
+        # returns True once the last enemy of the level is destroyed
+        enemy.hit()
+        if enemy.health <= 0 and enemy in self.enemies:
+            self.enemies.remove(enemy)
+            if not self.enemies:
+                self.level += 1
+                return True
+        return False
+
+    def enemy_arrays(self, *names):
+        # one array per attribute of every enemy, for the passes that handle all of them at once
+        fields = operator.attrgetter(*names)
+        rows = np.array([fields(enemy) for enemy in self.enemies], dtype=np.float64).reshape(len(self.enemies), len(names))
+        return list(rows.T)
+
+    def enemies_touching(self, circle):
+        # enemies an explosion reaches, the same test as check_collision_circle
+        xs, ys, widths, heights = self.enemy_arrays("x", "y", "width", "height")
+        distance = np.hypot(circle.x - (xs + widths / 2), circle.y - (ys + heights / 2))
+        return [self.enemies[k] for k in np.nonzero(distance <= (circle.radius * 2 + widths) / 2)[0].tolist()]
+
+#------------------------------------------------------------------------- step -------------------------------------------------------------------------#
+    def advance(self, dt, max_steps=None):
+        """Run the ticks dt seconds of real time cover, stopping at an event, and return the interpolation factor."""
+        if max_steps is None:
+            max_steps = self.max_catch_up
+        self.accumulator += dt
+        steps = 0
+        while self.accumulator >= self.tick and not self.events:
+            if steps == max_steps:
+                # too far behind (slow machine, window drag): drop the backlog instead of spiralling
+                self.accumulator %= self.tick
+                break
+            self.step()
+            self.accumulator -= self.tick
+            steps += 1
+
+        return min(self.accumulator / self.tick, 1)
+
+    def step(self):
+        # every phase runs in a profiler scope, they cost a method call while the profiler is off
+        profile = self.profiler.scope
+        if self.recorder is not None:
+            self.recorder.inputs(self)
+        self.ticks += 1
+        self.clock.advance(self.tick)
+
+        # remember where everything was so the renderer can interpolate between ticks
+        self.tank.render_prev = (self.tank.x, self.tank.y)
+        for enemy in self.enemies:
+            enemy.render_prev = (enemy.x, enemy.y)
+        now = self.now
+
+        # Calculate movement distance based on normalized speed
+        movement_distance = self.tank.speed*self.cell_size # Adjust speed based on screen size
+
+        explosions_to_remove = []
+        ground_to_remove = []
+        craters = []
+
+        enemy_dead = False
+
+        with profile("explosions"):
+            for explosion in self.explosions:
+                if explosion.radius*2 < explosion.effect_diameter:
+                        explosion.increase_explosion_radius()
+                else:
+                    explosions_to_remove.append(explosion)
+
+                    touching, rect2 = self.check_collision_circle(circle=explosion, rect=self.tank)
+                    if touching:
+                        self.hit_tank()
+                        self.credit(explosion.owner, explosion.shot, self.tank)
+
+                    for enemy in self.enemies_touching(explosion):
+                        self.credit(explosion.owner, explosion.shot, enemy)
+                        enemy_dead = self.hit_enemy(enemy) or enemy_dead
+
+                    # the crater is carved out of the terrain grid in one step at the end of the frame
+                    craters.append((explosion.x, explosion.y, explosion.radius))
+
+        #tank collisions
+        with profile("tank"):
+            right = ("right" in self.keys_pressed or "d" in self.keys_pressed) and self.tank.x + self.tank.width + movement_distance < self.width
+            left = ("left" in self.keys_pressed or "a" in self.keys_pressed) and self.tank.x - movement_distance > 0
+
+            falling, right, left = self.ground_contact(self.tank, right, left, movement_distance)
+
+        with profile("enemy_ai"):
+            enemy_moves = self.enemies_ai(now)
+
+        with profile("enemy_ground"):
+            enemy_moves = self.enemies_ground_contact(enemy_moves)
+
+        with profile("movement"):
+            if falling:
+                self.tank.fall(self.cell_size)
+                if self.tank.y < 0:
+                    self.tank.y = self.cell_size+1
+
+            # Move tank horizontally
+            if right:
+                self.tank.move_right(cell_size=self.cell_size)
+
+            if left:
+                self.tank.move_left(cell_size=self.cell_size)
+
+            self.tank.set_cannon_angle(self.mouse)#move the player cannon
+
+            for enemy, (enemy_falling, enemy_right, enemy_left) in zip(self.enemies, enemy_moves):
+                if enemy_falling:
+                    enemy.fall(self.cell_size)
+                    if enemy.y < 0:
+                        enemy.y = self.cell_size+1
+
+                if enemy_right:
+                    enemy.move_right(cell_size=self.cell_size)
+
+                if enemy_left:
+                    enemy.move_left(cell_size=self.cell_size)
+
+
+        #-------------neutral functions --------------------------------
+        if self.bullets.count:
+            with profile("bullets"):
+                enemy_dead = self.step_bullets(ground_to_remove) or enemy_dead
+
+        if "tab" in self.keys_up:
+            if self.current_weapon >= len(self.weapons) -1:
+                self.current_weapon = 0
+            else:
+                self.current_weapon += 1
+            self.tank.switch_weapon(self.weapons[self.current_weapon], now)
+
+        with profile("terrain"):
+            for explosion in explosions_to_remove:
+                self.explosions.remove(explosion)
+                self.explosion_pool.release(explosion)
+
+            for ground in ground_to_remove:
+                self.remove_ground(ground)
+
+            for crater in craters:
+                for cx in self.terrain.carve_circle(*crater):
+                    self.dirty_chunks.add(cx // self.chunk_size)
+
+#-------------------------------------------------------------------------reload functions-------------------------------------------------------------------------#
+
+        with profile("reload"):
+            self.tank.check_reloading(now)
+
+            for enemy in self.enemies:
+                if enemy.reloading:
+                    enemy.check_reloading(now)
+
+            if "r" in self.keys_pressed:
+                self.tank.reload_weapon(now)
+
+        self.keys_up = []
+
+        if enemy_dead:
+            self.events.append("enemy_destroyed")
+
+#------------------------------------------------------------------------- ground contact -------------------------------------------------------------------------#
+    def ground_contact(self, unit, right, left, distance):
+        """Check a unit against the terrain columns under and beside it, returns (falling, right, left)."""
+        terrain = self.terrain
+        foot_row = int(math.floor((unit.y - 3) / self.cell_size))  # the row just under the unit
+
+        falling = True
+        for cx in terrain.columns_between(unit.x, unit.right):
+            if terrain.solid_at(cx, foot_row):
+                falling = False
+                unit.y = min(unit.y, (foot_row + 1) * self.cell_size)
+                break
+
+        if right:
+            right = self.step_ahead(unit, distance)
+        if left:
+            left = self.step_ahead(unit, -distance)
+
+        return falling, right, left
+
+    def step_ahead(self, unit, dx):
+        # test a horizontal move of dx against the ground, returns whether the unit can go ahead
+        terrain = self.terrain
+        rows = terrain.rows_between(unit.y, unit.top)
+
+        for cx in terrain.columns_between(unit.x + dx, unit.right + dx):
+            if terrain.column_top(cx) <= rows.start:
+                continue  # the whole column is below the unit
+
+            for cy in rows:
+                if not terrain.solid_at(cx, cy):
+                    continue
+
+                # a wall, climb it if there is room for the unit on top of the cell
+                if terrain.can_step_up(cx, int(math.floor((unit.y + 3) / self.cell_size)), round(unit.height / self.cell_size)):
+                    unit.y = (cy + 1) * self.cell_size + 1
+                    return True
+
+                wall_x = terrain.cell_origin(cx, cy)[0]
+                unit.x = wall_x - unit.width if dx > 0 else wall_x + self.cell_size - 1
+                return False
+
+        return True
+
+    def enemies_ground_contact(self, moves):
+        """ground_contact for every enemy at once on the (left, right) moves they asked for, returns (falling, right, left) each."""
+        xs, ys, widths = self.enemy_arrays("x", "y", "width")
+        foot_rows = np.floor((ys - 3) / self.cell_size).astype(np.int64)
+        standing = self.terrain.solid_in_rows(xs, xs + widths, foot_rows)
+
+        # snap the standing ones onto the ground
+        snapped = np.where(standing, np.minimum(ys, (foot_rows + 1) * self.cell_size), ys).tolist()
+        for enemy, y in zip(self.enemies, snapped):
+            enemy.y = y
+
+        contacts = []
+        for enemy, stands, (left, right) in zip(self.enemies, standing.tolist(), moves):
+            if right or left:
+                distance = enemy.speed*self.cell_size # Adjust speed based on screen size
+
+                if enemy.x + distance + enemy.width > self.width:
+                    enemy.x = self.width - enemy.width
+                    right = False
+
+                if enemy.x - distance < 0:
+                    enemy.x = 0
+                    left = False
+
+                if right:
+                    right = self.step_ahead(enemy, distance)
+                if left:
+                    left = self.step_ahead(enemy, -distance)
+
+            contacts.append((not stands, right, left))
+        return contacts
+
+#------------------------------------------------------------------------- bullet physics -------------------------------------------------------------------------#
+    def step_bullets(self, ground_to_remove):
+        """Move every bullet and resolve its hits, returns True when a laser killed the last enemy."""
+        bullets = self.bullets
+        enemy_dead = False
+
+        bullets.integrate()  # move all the bullets
+        n = bullets.count
+        laser = bullets.laser[:n]
+        remove = np.zeros(n, dtype=bool)
+
+        touching = bullets.touching_rect(self.tank)
+        for i in np.nonzero(touching & laser)[0].tolist():
+            self.hit_tank()
+            self.credit(bullets.owner[i], bullets.ids[i], self.tank)
+        remove |= touching
+
+        # every bullet against every enemy in one broadcast
+        enemies = list(self.enemies)
+        touching = bullets.touching_rects(*self.enemy_arrays("x", "y", "width", "height"))
+        for i, k in zip(*np.nonzero(touching & laser[:, None])):
+            self.credit(bullets.owner[i], bullets.ids[i], enemies[k])
+            enemy_dead = self.hit_enemy(enemies[k]) or enemy_dead
+        remove |= touching.any(axis=1)
+
+        bullets.drill[:n][laser] -= 1
+        remove |= laser & (bullets.drill[:n] < 1)
+
+        remove |= bullets.outside(self.width, self.height)
+
+        # only bullets whose step passed close to solid ground walk the grid
+        radius = bullets.radius[:n]
+        near = self.terrain.solid_near_segments(bullets.prev_x[:n] + radius, bullets.prev_y[:n] + radius,
+                                                bullets.x[:n] + radius, bullets.y[:n] + radius)
+        for i in np.nonzero(near)[0].tolist():
+            if self.bullet_ground_collision(i, ground_to_remove):
+                remove[i] = True
+
+        if self.obstacle_table.size:
+            with self.profiler.scope("obstacles"):
+                self.apply_obstacles()
+
+        # spent bullets explode, lasers just vanish
+        if remove.any():
+            for i in np.nonzero(remove & ~laser)[0].tolist():
+                self.explode(bullets.x[i], bullets.y[i], bullets.effect_diameter[i], bullets.owner[i], bullets.ids[i])
+            bullets.remove(remove)
+
+        # the laser beams are drawn by the renderer
+        bullets.extend_trails()
+        return enemy_dead
+
+    def apply_obstacles(self, bullets=None):
+        # pair every bullet with the obstacles bucketed in its chunk, bullets far from all obstacles cost nothing more
+        bullets = self.bullets if bullets is None else bullets
+        n = bullets.count
+        chunk_width = self.chunk_size * self.cell_size
+        chunks = ((bullets.x[:n] + bullets.radius[:n] - self.terrain.x_offset) // chunk_width).astype(np.int64)
+        np.minimum(np.maximum(chunks, 0, out=chunks), self.chunk_number - 1, out=chunks)
+
+        candidates = self.obstacle_table[chunks]
+        pair_bullets, slots = np.nonzero(candidates >= 0)
+        if not len(pair_bullets):
+            return
+        pair_obstacles = candidates[pair_bullets, slots]
+
+        # gravity wells pull (or push) the non laser bullets inside their effect radius, all pairs in one pass
+        pulled = (self.well_reach[pair_obstacles] > 0) & ~bullets.laser[pair_bullets]
+        if pulled.any():
+            b, k = pair_bullets[pulled], pair_obstacles[pulled]
+            dist_x = self.well_x[k] - (bullets.x[b] + bullets.radius[b])
+            dist_y = self.well_y[k] - (bullets.y[b] + bullets.radius[b])
+            distance = np.maximum(1, np.hypot(dist_x, dist_y))
+
+            step = np.where(distance < self.well_reach[k], self.well_pull[k] * bullets.mass[b] / distance, 0)
+            bullets.x[:n] += np.bincount(b, weights=step * dist_x, minlength=n)
+            bullets.y[:n] += np.bincount(b, weights=step * dist_y, minlength=n)
+
+        # wormholes move bullets from one mouth to the other, one wormhole after the other
+        through = self.wormholes[pair_obstacles]
+        if through.any():
+            for k in np.unique(pair_obstacles[through]).tolist():
+                self.obstacles[k].wormholeCheck(bullets, np.unique(pair_bullets[pair_obstacles == k]))
+
+    def bullet_ground_collision(self, i, ground_to_remove, bullets=None):
+        # walk the cells the centre of bullet i crossed this step, returns True when the bullet is spent
+        bullets = self.bullets if bullets is None else bullets
+        radius = bullets.radius[i]
+        prev = (bullets.prev_x[i], bullets.prev_y[i])
+        x0, y0 = prev[0] + radius, prev[1] + radius
+        x1, y1 = bullets.x[i] + radius, bullets.y[i] + radius
+        laser = bullets.laser[i]
+
+        for cx, cy, face, t in self.terrain.segment_cells(x0, y0, x1, y1):
+            if not self.terrain.solid_at(cx, cy):
+                continue
+
+            ground = self.terrain.cell(cx, cy)
+            if face is None:
+                # the step started inside this cell, take its exposed side facing the way the bullet came
+                face = self.terrain.exposed_face(cx, cy, x1 - x0, y1 - y0)
+
+            # where the bullet entered the cell, in bullet coordinates
+            hit_x = x0 + (x1 - x0) * t - radius
+            hit_y = y0 + (y1 - y0) * t - radius
+
+            if laser and ground.reflective:
+                bullets.x[i], bullets.y[i] = prev
+                bullets.reflect(i, FACE_NORMAL_ANGLES[face])
+
+            elif not laser and ground.elastic:
+                bullets.speed[i] *= 0.95
+                bullets.x[i], bullets.y[i] = prev
+                bullets.flighttime[i] = 0
+                bullets.reflect(i, FACE_NORMAL_ANGLES[face])
+
+            elif bullets.drill[i] <= 0:
+                # stop at the impact so the crater is not dug past the ground the bullet hit
+                bullets.x[i], bullets.y[i] = hit_x, hit_y
+                return True
+
+            elif not ground.bulletproof:
+                bullets.drill[i] -= 1
+
+                if bullets.repeat_explosions[i]:
+                    self.explode(hit_x, hit_y, bullets.effect_diameter[i], bullets.owner[i], bullets.ids[i])
+
+                if laser:
+                    ground_to_remove.append(ground)
+
+            else:
+                continue  # drilling bullets go on through bulletproof cells looking for another one
+
+            break  # No need to check further collisions for this bullet if it has already collided
+
+        return False
+
+    def explode(self, x, y, effect_diameter, owner=-1, shot=-1):
+        explosion = self.explosion_pool.acquire()
+        explosion.arm(effect_diameter=float(effect_diameter) * self.cell_size, pos=(float(x), float(y)),
+                      owner=int(owner), shot=int(shot))
+        self.explosions.add(explosion)
+
+    def pool_stats(self):
+        return {"bullets": self.bullets.stats(), "explosions": self.explosion_pool.stats()}
+
+#------------------------------------------------------------------------- trajectory preview -------------------------------------------------------------------------#
+
+    def trajectory(self):
+        """
+        Flat [x0, y0, x1, y1, ...] list of the centres the tank's next shot would pass through.
+        The same list comes back while the aim is unchanged; a new path is flown a few steps per call.
+        """
+        tank = self.tank
+        angle = round(tank.cannon_angle / self.preview_angle_step)
+        power = round(tank.calculate_shoot_speed_multiplier(self.now) / self.preview_power_step)
+        key = (angle, power, self.current_weapon, self.terrain.to_cell(tank.center_x, tank.center_y), self.terrain.version)
+
+        path = self.previews.get(key)
+        if path is not None:
+            return path
+
+        if self.preview_job is None or self.preview_job[0] != key:
+            shot = tank.projectile(self.weapons[self.current_weapon], self.cell_size,
+                                   angle * self.preview_angle_step, power * self.preview_power_step)
+            path = []
+            self.preview_job = (key, path, self.simulate_shot(shot, path))
+        _, path, job = self.preview_job
+
+        for _ in range(self.preview_steps_per_call):
+            try:
+                next(job)
+            except StopIteration:
+                self.preview_job = None
+                if len(self.previews) >= self.preview_cache_size:
+                    self.previews.clear()
+                self.previews[key] = path
+                return path
+        return list(path)
+
+    def simulate_shot(self, shot, path):
+        # fly one bullet through the same steps as step_bullets on a scratch pool, nothing in the world is touched;
+        # a generator that adds the bullet's centre to path after every step and yields
+        bullets = self.preview_bullets
+        bullets.clear()
+        bullets.add(**dict(shot, repeat_explosions=False))
+        radius = bullets.radius[0]
+        path += (float(bullets.x[0] + radius), float(bullets.y[0] + radius))
+        craters = []
+        enemies = self.enemy_arrays("x", "y", "width", "height")
+        terrain = self.terrain
+
+        for _ in range(self.preview_steps):
+            bullets.integrate()
+            done = bool(bullets.touching_rect(self.tank)[0] or bullets.touching_rects(*enemies)[0].any()
+                        or bullets.outside(self.width, self.height)[0])
+
+            if bullets.laser[0]:
+                bullets.drill[0] -= 1
+                done = done or bullets.drill[0] < 1
+
+            # the ground is only walked once the bullet comes down to it
+            x0, x1 = sorted((bullets.prev_x[0], bullets.x[0]))
+            if not done and not terrain.above_ground(x0, x1 + 2 * radius, min(bullets.prev_y[0], bullets.y[0])):
+                done = self.bullet_ground_collision(0, craters, bullets)
+
+            if not done and self.obstacle_table.size:
+                self.apply_obstacles(bullets)
+
+            path += (float(bullets.x[0] + radius), float(bullets.y[0] + radius))
+            if done:
+                return
+            yield
+
+#------------------------------------------------------------------------- enemy aiming -------------------------------------------------------------------------#
+
+    def enemies_ai(self, now):
+        """Run the AI of every enemy, returns the (left, right) move each one wants."""
+        target_x, target_y = self.tank.center_x, self.tank.center_y
+        xs, ys, widths, heights, cannon_lengths, angles, ranges, last_shots, reloading = self.enemy_arrays(
+            "x", "y", "width", "height", "cannon_length", "cannon_angle", "weapon_range", "last_shot_time", "reloading")
+        dx = target_x - (xs + widths / 2 + cannon_lengths * np.cos(angles))
+        dy = target_y - (ys + heights / 2 + cannon_lengths * np.sin(angles))
+
+        in_range = np.hypot(dx, dy) <= ranges * self.cell_size
+        loaded = (now - last_shots >= 1 / self.enemy_weapon.get("firerate")) & (reloading == 0)
+        firing = in_range & loaded
+
+        moves = [(0, 0)] * len(self.enemies)
+        for k in np.nonzero(firing)[0].tolist():
+            self.enemies[k].enemy_ai(self, target_x, target_y)
+        self.run_aim_jobs()
+
+        for k, enemy in enumerate(self.enemies):
+            if enemy.moving and not firing[k]:
+                moves[k] = (1, 0) if dx[k] < 0 else (0, 1)
+        return moves
+
+    def enemy_aim(self, enemy, target_x, target_y):
+        """Angle an enemy should fire at to hit (target_x, target_y), cached until the ground its shots crossed changes."""
+        terrain = self.terrain
+        weapon = self.enemy_weapon
+        key = (terrain.to_cell(enemy.center_x, enemy.center_y), enemy.direct_hitter, terrain.to_cell(target_x, target_y),
+               weapon["speed"], weapon["mass"], weapon["radius"], weapon["drill"])
+
+        cached = self.aims.get(key)
+        if cached is not None:
+            angle, first, last, version = cached
+            if not terrain.changed_since(version, first, last + 1):
+                return angle
+            del self.aims[key]
+
+        job = self.aim_jobs.get(enemy)
+        if job is None or job.key != key:
+            # a job of this enemy still aiming from or at an old cell is replaced
+            job = self.aim_jobs[enemy] = AimJob(key, terrain.version, self.aimed.get(enemy))
+            job.solve = self.solve_aim(job, enemy, target_x, target_y)
+            if job.best is None:
+                next(job.solve)  # works out the vacuum solution, before any shot is flown
+        return job.best
+
+    def run_aim_jobs(self):
+        # advance the queued solves by aim_steps_per_tick flight steps in total, one job at a time
+        terrain = self.terrain
+        for _ in range(self.aim_steps_per_tick):
+            if not self.aim_jobs:
+                return
+            enemy, job = next(iter(self.aim_jobs.items()))
+            if job.first is not None and terrain.changed_since(job.version, job.first, job.last + 1):
+                job.version = terrain.version
+                job.first = job.last = None
+                job.solve = self.solve_aim(job, enemy, *job.target)
+                next(job.solve)
+
+            job.steps += 1
+            try:
+                next(job.solve)
+            except StopIteration as solved:
+                self.finish_aim(enemy, job, solved.value)
+            else:
+                if job.steps >= self.aim_step_budget:
+                    self.finish_aim(enemy, job, job.best)
+
+    def finish_aim(self, enemy, job, angle):
+        # cache a solve's angle with the columns its shots crossed
+        del self.aim_jobs[enemy]
+        self.aimed[enemy] = angle
+        first, last = (job.first, job.last) if job.first is not None else (0, self.terrain.columns - 1)
+        self.aims[job.key] = (angle, first, last, job.version)
+
+    def aim_candidates(self, enemy, x, y, speed, g):
+        # both roots of the vacuum ballistic equation with a spread around each, and the root the enemy prefers;
+        # out of range there is no root and a fan of angles towards the target is tried instead
+        discriminant = speed ** 4 - g * (g * x ** 2 + 2 * y * speed ** 2)
+        spread = np.linspace(-self.aim_spread, self.aim_spread, self.aim_candidates_per_root)
+
+        if discriminant < 0:
+            fan = np.linspace(0, math.pi / 2, 2 * self.aim_candidates_per_root)
+            return (fan if x >= 0 else math.pi - fan), None
+
+        low = math.atan2(speed ** 2 - math.sqrt(discriminant), g * x)
+        high = math.atan2(speed ** 2 + math.sqrt(discriminant), g * x)
+        return np.concatenate((low + spread, high + spread)), low if enemy.direct_hitter else high
+
+    def solve_aim(self, job, enemy, target_x, target_y):
+        # fly the candidates, then narrow the spread around the best one until a shot reaches the target;
+        # yields after every flight step and returns the angle
+        weapon = self.enemy_weapon
+        start_x, start_y = enemy.cannon_tip()
+        angles, preferred = self.aim_candidates(enemy, target_x - start_x, target_y - start_y,
+                                                weapon["speed"] * self.cell_size, weapon["mass"] * self.cell_size)
+        job.target = (target_x, target_y)
+        if job.best is None:
+            # out of range the shot goes as far as it can
+            job.best = preferred if preferred is not None else math.pi / 4 if target_x >= start_x else 3 * math.pi / 4
+        yield
+
+        miss = yield from self.fly_shots(job, enemy, angles, target_x, target_y)
+        spread = self.aim_spread
+
+        for _ in range(self.aim_refinements):
+            best, reached = self.pick_aim(angles, miss, preferred)
+            job.best = best
+            if reached:
+                return best
+            spread /= self.aim_candidates_per_root - 1
+            finer = best + np.linspace(-spread, spread, 2 * self.aim_candidates_per_root)
+            angles = np.concatenate((angles, finer))
+            miss = np.concatenate((miss, (yield from self.fly_shots(job, enemy, finer, target_x, target_y))))
+
+        return self.pick_aim(angles, miss, preferred)[0]
+
+    def pick_aim(self, angles, miss, preferred):
+        # among the shots that reach the target the one closest to the preferred root, otherwise the nearest miss
+        reaching = miss <= self.tank.width / 2
+        if preferred is not None and reaching.any():
+            off = np.abs((angles - preferred + math.pi) % (2 * math.pi) - math.pi)
+            return float(angles[np.argmin(np.where(reaching, off, np.inf))]), True
+        best = int(np.argmin(miss))
+        return float(angles[best]), bool(reaching[best])
+
+    def fly_shots(self, job, enemy, angles, target_x, target_y):
+        # fly a shot at every angle at once on a scratch pool like step_bullets, yields after every step
+        # and returns the closest distance each one got to the target
+        bullets = self.aim_bullets
+        bullets.clear()
+        first = bullets.next_id
+        for angle in angles.tolist():
+            bullets.add(**dict(enemy.projectile(self.enemy_weapon, self.cell_size, angle), repeat_explosions=False))
+
+        miss = np.full(len(angles), np.inf)
+        craters = []
+        tired = bullets.speed[0] * self.aim_min_speed  # elastic ground takes 5% per bounce, rolling shots are given up
+        ceiling = (int(self.terrain.tops.max()) + 2) * self.cell_size  # above this no step can touch the ground
+        for _ in range(self.aim_steps):
+            if not bullets.count:
+                break
+
+            bullets.integrate()
+            n = bullets.count
+            radius = bullets.radius[:n]
+            done = bullets.outside(self.width, self.height) | (bullets.speed[:n] < tired)
+            job.cover(self.terrain, np.concatenate((bullets.prev_x[:n], bullets.x[:n] + 2 * radius)))
+
+            if min(bullets.y[:n].min(), bullets.prev_y[:n].min()) < ceiling:
+                near = self.terrain.solid_near_segments(bullets.prev_x[:n] + radius, bullets.prev_y[:n] + radius,
+                                                        bullets.x[:n] + radius, bullets.y[:n] + radius)
+                for i in np.nonzero(near & ~done)[0].tolist():
+                    if self.bullet_ground_collision(i, craters, bullets):
+                        done[i] = True
+
+            # a shot that lands on the ground next to the target still counts for how close it got
+            distance = np.hypot(bullets.x[:n] + radius - target_x, bullets.y[:n] + radius - target_y)
+            hit = bullets.touching_rect(self.tank)
+            distance[hit] = 0
+            slots = bullets.ids[:n] - first
+            miss[slots] = np.minimum(miss[slots], distance)
+            done |= hit
+
+            if self.obstacle_table.size:
+                self.apply_obstacles(bullets)
+            if done.any():
+                bullets.remove(done)
+            yield
+
+        return miss
+
+#-------------------------------------------------------------------------collision functions-------------------------------------------------------------------------#
+
+    def check_collision_circle(self, circle, rect, gravity=0, speed=0):
+        # Calculate center coordinates of the rectangle
+        rect_center_x, rect_center_y = rect.x + rect.width / 2, rect.y + rect.height / 2
+
+        # Calculate the distance between the centers of the circle and rectangle
+        distance = math.hypot(circle.x - rect_center_x, circle.y - rect_center_y)
+
+        # Check if the distance between the centers is less than or equal to the maximum allowed distance
+        # and if all corners of the rectangle are within the circle
+        if (distance <= (circle.radius*2+rect.width)/2):
+            return True, [rect.x, rect.y, rect.x + rect.width, rect.y + rect.height]
+
+        return False, []